@@ -1,14 +1,18 @@
 import streamlit as st
 import sqlite3
 import bcrypt
-import pandas as pd
-import plotly.express as px
-from PIL import Image
 import base64
-import io
-from datetime import datetime
-from prophet import Prophet
+import tempfile
+from datetime import date, datetime
 import streamlit.components.v1 as components
+from xpense import forecast_pool, metrics, writer
+from xpense.balance import current_balance
+from xpense.blobs import get_blob, get_thumbnail
+from xpense.db import get_connection
+from xpense.images import MIME_TYPE, InvalidImageError
+from xpense.ledger import JENIS, KATEGORI, add_transaction, data_version, delete_transaction, set_profile_pic, update_transaction
+from xpense.migrations import migrate
+from xpense.settings import get_settings, set_emergency_rate
 
 def angka_input_with_format(label, key="formatted_input"):
     st.markdown(f"<label>{label}</label>", unsafe_allow_html=True)
@@ -35,69 +39,24 @@ def angka_input_with_format(label, key="formatted_input"):
     value = components.html(html_code, height=60)
     return value
 
-DB_NAME = "users.db"
-
-def get_connection():
-    return sqlite3.connect(DB_NAME)
-
-def initialize_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password_hash TEXT NOT NULL,
-        role TEXT DEFAULT 'user',
-        profile_pic BLOB,
-        emergency_rate INTEGER DEFAULT 10
-    )
-    """)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS laporan_keuangan (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        tanggal TEXT,
-        kategori TEXT,
-        jenis TEXT,
-        jumlah INTEGER,
-        dana_darurat INTEGER,
-        keterangan TEXT,
-        bukti_img BLOB
-    )
-    """)
-    conn.commit()
-    conn.close()
-
 def register_user(username, password, role):
     password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)", (username, password_hash, role))
-        conn.commit()
+        writer.execute(lambda conn: conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)", (username, password_hash, role)))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def login_user(username, password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT password_hash, role FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT password_hash, role FROM users WHERE username = ?", (username,)).fetchone()
     if row and bcrypt.checkpw(password.encode(), row[0]):
         return True, row[1]
     return False, None
 
 def get_user_settings(username):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT emergency_rate, profile_pic FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    # Cached per session and per process; reruns don't touch the database
+    return get_settings(username, st.session_state)
 
 def home_page():
     st.title("🏠 Home - Input Data Keuangan")
@@ -106,19 +65,20 @@ def home_page():
     if "input_key" not in st.session_state:
         st.session_state["input_key"] = 0
 
+    import_section()
+
+    # Set by the save below, which reruns the page before it could be shown
+    notice = st.session_state.pop("save_warning", None)
+    if notice:
+        st.warning(notice)
+
     tanggal = st.date_input("Tanggal Transaksi", value=datetime.now().date(), key=f"tanggal_{st.session_state['input_key']}")
     
     # Menambahkan opsi 'Pilih' pada selectbox Jenis
-    jenis = st.selectbox("Jenis", ["Pilih", "Pendapatan", "Pengeluaran"], key=f"jenis_{st.session_state['input_key']}")
+    jenis = st.selectbox("Jenis", ["Pilih"] + JENIS, key=f"jenis_{st.session_state['input_key']}")
 
     # Menentukan opsi kategori berdasarkan jenis yang dipilih, dan menambahkan 'Pilih'
-    kategori_options = []
-    if jenis == "Pilih":
-        kategori_options = ["Pilih"]
-    elif jenis == "Pendapatan":
-        kategori_options = ["Pilih", "Keuntungan"]
-    else: # jenis == "Pengeluaran"
-        kategori_options = ["Pilih", "Listrik", "Gaji", "PDAM", "Bahan Baku", "Sewa Tempat", "Lain-lain"]
+    kategori_options = ["Pilih"] + KATEGORI.get(jenis, [])
     
     kategori_index = 0
     if kategori_options and "Pilih" in kategori_options:
@@ -148,13 +108,14 @@ def home_page():
     emergency_rate, _ = get_user_settings(username)
     new_rate = st.slider("Persentase Dana Darurat (%)", 5, 10, emergency_rate)
     if new_rate != emergency_rate:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET emergency_rate = ? WHERE username = ?", (new_rate, username))
-        conn.commit()
-        conn.close()
+        set_emergency_rate(username, new_rate)
         st.success("✅ Persentase Dana Darurat berhasil diubah.")
 
+    saldo, dana_terkumpul = current_balance(username)
+    col1, col2 = st.columns(2)
+    col1.metric("💼 Saldo Kas", f"Rp {saldo:,.0f}".replace(",", "."))
+    col2.metric("🛟 Dana Darurat Terkumpul", f"Rp {dana_terkumpul:,.0f}".replace(",", "."))
+
     keterangan = st.text_input("Keterangan (Opsional)", key=f"keterangan_{st.session_state['input_key']}")
 
     bukti_img = None
@@ -180,145 +141,249 @@ def home_page():
             emergency_rate, _ = get_user_settings(username)
             dana_darurat = int(jumlah * (emergency_rate / 100)) if jenis == "Pendapatan" else 0
 
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_img)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (username, tanggal.isoformat(), kategori, jenis, jumlah, dana_darurat, keterangan, bukti_img))
-            conn.commit()
-            conn.close()
+            _, unusual = add_transaction(username, tanggal.isoformat(), kategori, jenis, jumlah, dana_darurat, keterangan, bukti_img)
+            if unusual:
+                z, rata_rata = unusual
+                rupiah = lambda angka: f"Rp {angka:,.0f}".replace(",", ".")
+                st.session_state["save_warning"] = (
+                    f"⚠️ Jumlah {rupiah(jumlah)} untuk {kategori} jauh di atas biasanya (rata-rata {rupiah(rata_rata)}, "
+                    f"{z:.1f} simpangan baku). Periksa kembali bila ada salah ketik."
+                )
             st.success("✅ Data berhasil disimpan.")
             # Increment key to reset all input widgets
             st.session_state["input_key"] += 1
             st.rerun()
+        except InvalidImageError as e:
+            st.error(str(e))
         except ValueError:
             st.error("Jumlah harus berupa angka valid, contoh: 100000")
         except Exception as e:
             st.error(f"Terjadi kesalahan: {e}")
 
 
-def generate_forecasting_insights(df_forecast, periods, data_type):
-    insights = []
-    
-    # Filter forecast to only include future predictions
-    future_forecast = df_forecast.tail(periods)
-
-    if future_forecast.empty:
-        insights.append(f"Tidak ada data *forecast* {data_type} di masa depan untuk dianalisis.")
-        return insights
-
-    # Get the last historical value for comparison (from the part of df_forecast that's not future)
-    # This needs to be robust, ensuring we get the actual last historical data point.
-    # We assume 'ds' is sorted and the last 'periods' rows are the future.
-    # So the last historical point would be just before the future period starts.
-    if len(df_forecast) > periods:
-        last_historical_value = df_forecast['yhat'].iloc[len(df_forecast) - periods - 1]
-    else:
-        # This case implies df_forecast largely consists of future data or very few historical points.
-        # We need a robust way to get the last actual historical data point.
-        # If 'y' column was preserved (which it isn't in 'forecast' output), we could use df_pendapatan['y'].iloc[-1].
-        # For 'forecast' dataframe, we can assume the last non-future point is the one just before the prediction starts.
-        # Or, if only future is available, the first prediction itself might serve as a baseline for trend.
-        # For simplicity and robustnes here, we'll try to find the last historical 'yhat' in df_forecast.
-        # This might not be ideal if df_forecast is mostly future, but works if it includes historical 'yhat' as well.
-        last_historical_value = df_forecast['yhat'].iloc[max(0, len(df_forecast) - periods - 1)]
-
-    # Calculate the average forecast for the future days
-    avg_forecast_future = future_forecast['yhat'].mean()
-
-    # Calculate the change from the last historical value to the end of the forecast period
-    final_forecast_value = future_forecast['yhat'].iloc[-1]
-    change = final_forecast_value - last_historical_value
-    
-    # Trend Analysis
-    if change > 0:
-        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan menunjukkan **tren meningkat** dalam {periods} hari ke depan, dengan estimasi kenaikan sekitar **Rp {change:,.0f}** dari periode terakhir yang tercatat.")
-    elif change < 0:
-        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan menunjukkan **tren menurun** dalam {periods} hari ke depan, dengan estimasi penurunan sekitar **Rp {abs(change):,.0f}** dari periode terakhir yang tercatat.")
+def import_section():
+    with st.expander("📥 Impor dari CSV/Excel"):
+        st.caption("Kolom wajib: tanggal, jenis, kategori, jumlah. Kolom keterangan opsional. "
+                   "Dana darurat dihitung dari persentase Anda saat ini.")
+        uploaded = st.file_uploader("File transaksi", type=["csv", "xlsx"], key=f"import_file_{st.session_state['input_key']}")
+        skip_invalid = st.checkbox("Lewati baris yang tidak valid", value=False,
+                                   help="Baris yang valid disimpan bertahap. Jika impor terhenti di tengah jalan, "
+                                        "bagian yang sudah tersimpan tetap ada.")
+        if uploaded and st.button("Impor Data"):
+            from xpense.importer import ImportFormatError, ImportInterrupted, import_transactions
+
+            username = st.session_state["username"]
+            try:
+                with st.spinner("Mengimpor data..."):
+                    imported, error_count, errors = import_transactions(username, uploaded, uploaded.name, skip_invalid)
+            except ImportFormatError as e:
+                st.error(str(e))
+                return
+            except ImportInterrupted as e:
+                st.error(f"❌ Impor terhenti: {e.error or 'waktu tunggu habis'}. {e.imported} baris sudah tersimpan; "
+                         "periksa Riwayat sebelum mengimpor ulang agar tidak tercatat ganda.")
+                return
+            except TimeoutError:
+                st.error("❌ Impor belum selesai diproses. Data mungkin tetap tersimpan beberapa saat lagi; "
+                         "periksa Riwayat sebelum mengimpor ulang.")
+                return
+            except Exception as e:
+                st.error(f"Terjadi kesalahan saat membaca file: {e}")
+                return
+            if error_count and not skip_invalid:
+                st.error(f"❌ {error_count} baris tidak valid, tidak ada data yang diimpor.")
+            elif error_count:
+                st.warning(f"⚠️ {imported} baris diimpor, {error_count} baris dilewati.")
+            else:
+                st.success(f"✅ {imported} transaksi berhasil diimpor.")
+            if errors:
+                st.dataframe([{"Baris": baris, "Kesalahan": pesan} for baris, pesan in errors], hide_index=True)
+
+
+def export_section(username, filters, key):
+    from xpense.exporter import FORMATS, MIME_TYPES, export
+
+    with st.expander("📤 Ekspor Data"):
+        st.caption("Mengikuti filter yang dipilih. Gambar bukti tidak ikut diekspor, hanya referensinya (bukti_ref).")
+        col1, col2 = st.columns(2)
+        fmt = FORMATS[col1.selectbox("Format", list(FORMATS), key=f"{key}_format")]
+        if col2.button("Siapkan File", key=f"{key}_prepare"):
+            # Rows are streamed into a temporary file on disk; only the finished
+            # file (without images) is handed to the download button.
+            with tempfile.TemporaryFile() as out:
+                with st.spinner("Menyiapkan file..."):
+                    count = export(out, fmt, username, **filters)
+                out.seek(0)
+                st.download_button(f"⬇️ Unduh {count:,} transaksi".replace(",", "."), out.read(),
+                                   file_name=f"xpense-{username}-{datetime.now():%Y%m%d}.{fmt}",
+                                   mime=MIME_TYPES[fmt], key=f"{key}_download")
+
+
+@st.fragment(run_every=1)
+def forecast_job_status():
+    job = st.session_state["forecast_job"]
+    status, elapsed = forecast_pool.poll(job["id"])
+    if status == forecast_pool.PENDING:
+        st.info(f"⏳ *Forecasting* {job['forecast_type']} sedang diproses... ({elapsed:.0f} detik)")
+        return
+
+    status, result = forecast_pool.collect(job["id"])
+    del st.session_state["forecast_job"]
+    if status == forecast_pool.DONE:
+        model_json, forecast = result
+        st.session_state["forecast_result"] = {**job, "model_json": model_json, "forecast": forecast}
     else:
-        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan **cenderung stabil** dalam {periods} hari ke depan.")
-
-    # Volatility/Uncertainty Analysis
-    # The range of uncertainty (yhat_upper - yhat_lower)
-    avg_uncertainty_range = (future_forecast['yhat_upper'] - future_forecast['yhat_lower']).mean()
-    if avg_forecast_future != 0: # Avoid division by zero
-        if avg_uncertainty_range < abs(avg_forecast_future) * 0.1: # Example threshold: less than 10% of average forecast
-            insights.append(f"Model menunjukkan **tingkat kepercayaan yang tinggi** terhadap prediksi ini, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari.")
-        elif avg_uncertainty_range < abs(avg_forecast_future) * 0.3: # Example threshold: less than 30%
-            insights.append(f"Prediksi memiliki **tingkat kepercayaan moderat**, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari. Fluktuasi kecil mungkin terjadi.")
+        st.session_state["forecast_result"] = {**job, "error": result}
+    st.rerun()
+
+
+@st.fragment(run_every=1)
+def category_job_status():
+    job = st.session_state["category_job"]
+    status, elapsed = forecast_pool.poll(job["id"])
+    if status == forecast_pool.PENDING:
+        st.info(f"⏳ *Forecasting* {len(job['kategori'])} kategori sedang diproses... ({elapsed:.0f} detik)")
+        return
+
+    status, results = forecast_pool.collect(job["id"])
+    del st.session_state["category_job"]
+    if status != forecast_pool.DONE:
+        results = {kategori: (status, results) for kategori in job["kategori"]}
+    st.session_state["category_result"] = category_result(job, {
+        kategori: (status, payload[1] if status == forecast_pool.DONE else payload)
+        for kategori, (status, payload) in results.items()
+    })
+    st.rerun()
+
+
+def category_result(job, outcomes):
+    # outcomes is {kategori: (status, forecast or error message)}
+    from xpense.forecasting import rank_categories
+
+    forecasts = {kategori: payload for kategori, (status, payload) in outcomes.items() if status == forecast_pool.DONE}
+    errors = {kategori: payload for kategori, (status, payload) in outcomes.items() if status != forecast_pool.DONE}
+    return {**job, "ranking": rank_categories(forecasts, job["periods"]), "errors": errors}
+
+
+def category_forecast_section(username, filters, periods, engine_name):
+    from xpense.engines import ENGINES
+    from xpense.forecasting import MIN_CATEGORY_POINTS, build_category_series, run_forecast
+    from xpense.queries import kategori_daily
+
+    # Every expense kategori from one pivot; each is fitted on its own,
+    # side by side in the forecast worker pool.
+    if st.button("Jalankan Forecasting"):
+        series, skipped = build_category_series(kategori_daily(username, **{**filters, "jenis": "Pengeluaran"}))
+        job = {"periods": periods, "engine": engine_name, "kategori": list(series), "skipped": skipped}
+        if not series:
+            st.info(f"Tidak ada kategori pengeluaran dengan minimal {MIN_CATEGORY_POINTS} hari data untuk *forecasting*.")
+        elif not ENGINES[engine_name].cache_fits:
+            # Fast engine: all kategori take milliseconds, run them right here
+            outcomes = {}
+            for kategori, kategori_series in series.items():
+                try:
+                    outcomes[kategori] = (forecast_pool.DONE, run_forecast(username, kategori, kategori_series, periods, engine=engine_name)[1])
+                except Exception as e:
+                    outcomes[kategori] = (forecast_pool.FAILED, str(e))
+            st.session_state["category_result"] = category_result(job, outcomes)
         else:
-            insights.append(f"Ada **ketidakpastian yang cukup tinggi** dalam prediksi ini, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari. Ini bisa disebabkan oleh data historis yang bervariasi. Pertimbangkan untuk menambahkan lebih banyak data atau memeriksa anomali.")
-    else:
-        insights.append(f"Tidak dapat menganalisis volatilitas karena {data_type} rata-rata yang diperkirakan adalah nol.")
+            job_id = forecast_pool.submit_group(username, series, periods, data_version(username), engine=engine_name)
+            if job_id is None:
+                st.warning("Masih ada *forecasting* Anda yang sedang diproses. Tunggu hingga selesai.")
+            else:
+                st.session_state["category_job"] = {**job, "id": job_id}
+                st.session_state.pop("category_result", None)
 
-    # Seasonal Analysis (simple check for daily/weekly patterns if present)
-    max_forecast_future = future_forecast['yhat'].max()
-    min_forecast_future = future_forecast['yhat'].min()
-    
-    if avg_forecast_future != 0 and (max_forecast_future - min_forecast_future) > (abs(avg_forecast_future) * 0.2): # If fluctuation is more than 20% of avg
-        insights.append(f"Terdapat indikasi **pola musiman** dalam {data_type}, dengan fluktuasi antara **Rp {min_forecast_future:,.0f}** dan **Rp {max_forecast_future:,.0f}** dalam {periods} hari ke depan. Perhatikan hari-hari atau periode tertentu yang mungkin memiliki {data_type} lebih tinggi atau lebih rendah.")
-    else:
-        insights.append(f"Pola musiman yang signifikan tidak terlalu terlihat dalam periode prediksi ini, menunjukkan {data_type} yang cenderung lebih konsisten dari hari ke hari.")
+    if "category_job" in st.session_state:
+        category_job_status()
 
-    return insights
+    result = st.session_state.get("category_result")
+    if not result or (result["periods"], result["engine"]) != (periods, engine_name):
+        return
+    rupiah = lambda angka: f"Rp {angka:,.0f}".replace(",", ".")
+    if result["ranking"]:
+        st.subheader(f"📊 Proyeksi Pertumbuhan Pengeluaran per Kategori ({periods} hari)")
+        st.dataframe([{
+            "Kategori": row["kategori"],
+            "Rata-rata terakhir / hari": rupiah(row["recent"]),
+            "Proyeksi rata-rata / hari": rupiah(row["projected"]),
+            "Pertumbuhan": "-" if row["growth"] is None else f"{row['growth']:+.1%}",
+        } for row in result["ranking"]], hide_index=True, use_container_width=True)
+        st.caption("Dibandingkan dengan rata-rata hasil model pada periode yang sama panjang tepat sebelum prediksi dimulai, "
+                   "pada hari-hari kategori tersebut tercatat.")
+        for row in result["ranking"]:
+            with st.expander(f"💡 Insights {row['kategori']}"):
+                for insight in row["insights"]:
+                    st.markdown(f"- {insight}")
+    for kategori, error in result["errors"].items():
+        st.error(f"*Forecasting* {kategori} gagal: {error}")
+    if result["skipped"]:
+        st.caption("Dilewati karena datanya terlalu sedikit: " + ", ".join(
+            f"{kategori} ({points} hari)" for kategori, points in result["skipped"].items()))
 
 
 def dashboard_page():
+    # pandas, plotly.express and the forecasting stack load on the first Dashboard
+    # visit, not at startup; benchmarks/check_import_time.py guards this.
+    from xpense import charts
+    from xpense.anomaly import Z_THRESHOLD, flagged
+    from xpense.balance import monthly_balance, running_balance
+    from xpense.batch_forecast import load_precomputed
+    from xpense.engines import ENGINES
+    from xpense.forecasting import (
+        CATEGORY_FORECAST, FORECAST_TYPES, build_series, generate_forecasting_insights, run_forecast,
+    )
+    from xpense.queries import daily_summary, has_transactions, kategori_options, tahun_options
+
     st.title("📊 Dashboard Keuangan")
     username = st.session_state["username"]
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM laporan_keuangan WHERE username = ?", conn, params=(username,))
-    conn.close()
 
-    if df.empty:
+    if not has_transactions(username):
         st.info("Tidak ada data.")
         return
 
-    df["tanggal"] = pd.to_datetime(df["tanggal"])
-    df["jenis"] = df["jenis"].str.lower()
+    filters = {}
 
     st.subheader("📂 Pilih Jenis Data")
     jenis_filter = st.selectbox("Tampilkan", ["Semua", "Pendapatan", "Pengeluaran"])
 
     if jenis_filter != "Semua":
-        df = df[df["jenis"] == jenis_filter.lower()]
-        if df.empty:
-            st.info(f"Tidak ada data {jenis_filter.lower()} yang tersedia.")
-            return
+        filters["jenis"] = jenis_filter
 
     # 🔎 Filter Kategori
     st.subheader("🏷️ Filter Kategori")
-    kategori_unik = sorted(df["kategori"].unique())
+    kategori_unik = kategori_options(username, jenis=filters.get("jenis"))
+    if not kategori_unik:
+        st.info(f"Tidak ada data {jenis_filter.lower()} yang tersedia.")
+        return
     kategori_filter = st.selectbox("Pilih Kategori", ["Semua"] + kategori_unik)
 
     if kategori_filter != "Semua":
-        df = df[df["kategori"] == kategori_filter]
-        if df.empty:
-            st.info("Tidak ada data untuk kategori tersebut.")
-            return
+        filters["kategori"] = kategori_filter
 
     st.subheader("📅 Filter Waktu")
     filter_mode = st.selectbox("Filter Berdasarkan", ["Semua", "Hari", "Bulan", "Tahun", "Rentang Tanggal"])
 
     if filter_mode == "Hari":
-        tanggal = st.date_input("Pilih Tanggal")
-        df = df[df["tanggal"].dt.date == tanggal]
+        filters["hari"] = st.date_input("Pilih Tanggal")
     elif filter_mode == "Bulan":
         bulan_list = [
             "Januari", "Februari", "Maret", "April", "Mei", "Juni",
             "Juli", "Agustus", "September", "Oktober", "November", "Desember"
         ]
         bulan = st.selectbox("Pilih Bulan", bulan_list)
-        bulan_angka = bulan_list.index(bulan) + 1
-        df = df[df["tanggal"].dt.month == bulan_angka]
+        filters["bulan"] = bulan_list.index(bulan) + 1
     elif filter_mode == "Tahun":
-        tahun = st.selectbox("Pilih Tahun", sorted(df["tanggal"].dt.year.unique()))
-        df = df[df["tanggal"].dt.year == tahun]
+        filters["tahun"] = st.selectbox("Pilih Tahun", tahun_options(username, jenis=filters.get("jenis"), kategori=filters.get("kategori")))
     elif filter_mode == "Rentang Tanggal":
         rentang = st.date_input("Pilih Rentang", [])
         if len(rentang) == 2:
-            df = df[(df["tanggal"] >= pd.to_datetime(rentang[0])) & (df["tanggal"] <= pd.to_datetime(rentang[1]))]
+            filters["rentang"] = rentang
+
+    export_section(username, filters, "dashboard_export")
+
+    # Aggregated per day in SQL; only the days in the selected range come back
+    df = daily_summary(username, **filters)
 
     if df.empty:
         st.info("Tidak ada data untuk filter yang dipilih.")
@@ -333,23 +398,17 @@ def dashboard_page():
         y_data = ["pendapatan", "pengeluaran"]
 
     # Calculate sums for current view
-    total_pendapatan = df[df["jenis"] == "pendapatan"]["jumlah"].sum()
-    total_pengeluaran = df[df["jenis"] == "pengeluaran"]["jumlah"].sum()
+    total_pendapatan = df["pendapatan"].sum()
+    total_pengeluaran = df["pengeluaran"].sum()
     keuntungan_bersih = total_pendapatan - total_pengeluaran
 
-    # Create a daily summary for charting
-    daily_summary = df.groupby(["tanggal", "jenis"])["jumlah"].sum().unstack().fillna(0)
-    if "pendapatan" not in daily_summary.columns:
-        daily_summary["pendapatan"] = 0
-    if "pengeluaran" not in daily_summary.columns:
-        daily_summary["pengeluaran"] = 0
-    daily_summary = daily_summary.reset_index()
-
-
-    fig = px.line(daily_summary, x="tanggal", y=y_data, markers=True,
-                    title="Tren Keuangan Harian",
-                    labels={"value": "Jumlah", "tanggal": "Tanggal"},
-                    color_discrete_map={"pendapatan": "#4CAF50", "pengeluaran": "#F44336"})
+    # Long ranges are summed per week or month and downsampled before they
+    # reach the browser; the figure is reused while data and filters stay the same.
+    granularitas = st.selectbox("Granularitas Grafik", ["Otomatis"] + charts.GRANULARITIES)
+    if granularitas == "Otomatis":
+        granularitas = charts.auto_granularity(df)
+    key = ("trend", username, data_version(username), tuple(sorted((k, str(v)) for k, v in filters.items())), tuple(y_data), granularitas)
+    fig = charts.cached_figure(key, lambda: charts.trend_figure(df, y_data, granularitas))
     st.plotly_chart(fig)
 
     # --- Modern & Minimalist Summary ---
@@ -416,113 +475,176 @@ def dashboard_page():
     st.info(f"**Ringkasan ini mencakup data dari tanggal {df['tanggal'].min().strftime('%d %b %Y')} hingga {df['tanggal'].max().strftime('%d %b %Y')}.**")
     # --- End Modern & Minimalist Summary ---
 
+    # Running balance over the whole ledger (jenis/kategori filters do not
+    # apply); a year or date range shows days, everything else month ends.
+    st.subheader("💼 Saldo & Dana Darurat")
+    if "rentang" in filters:
+        balance_rows, periode = running_balance(username, *filters["rentang"]), "tanggal"
+    elif "tahun" in filters:
+        balance_rows, periode = running_balance(username, date(int(filters["tahun"]), 1, 1), date(int(filters["tahun"]), 12, 31)), "tanggal"
+    else:
+        balance_rows, periode = monthly_balance(username), "bulan"
+    if balance_rows:
+        key = ("balance", username, data_version(username), periode, str(filters.get("rentang") or filters.get("tahun")))
+        st.plotly_chart(charts.cached_figure(key, lambda: charts.balance_figure(balance_rows, periode)))
+        st.caption("Saldo = total pendapatan dikurangi total pengeluaran sejak transaksi pertama, tanpa filter jenis dan kategori.")
+
+    unusual = flagged(username, **filters)
+    if unusual:
+        st.subheader("⚠️ Transaksi Tidak Biasa")
+        st.caption(f"Jumlah lebih dari {Z_THRESHOLD:g} simpangan baku di atas rata-rata kategorinya.")
+        st.dataframe([{
+            "Tanggal": row["tanggal"],
+            "Kategori": row["kategori"],
+            "Jumlah": f"Rp {row['jumlah']:,.0f}".replace(",", "."),
+            "Rata-rata": f"Rp {row['rata_rata']:,.0f}".replace(",", "."),
+            "Skor z": round(row["z"], 1),
+            "Keterangan": row["keterangan"],
+        } for row in unusual], hide_index=True, use_container_width=True)
+
 
     st.subheader("📈 Forecasting")
     
     # New selectbox for forecasting type
-    forecast_type = st.selectbox("Pilih jenis data untuk Forecasting:", ["Pendapatan", "Pengeluaran", "Keuntungan (Pendapatan - Pengeluaran)"])
+    forecast_type = st.selectbox("Pilih jenis data untuk Forecasting:", list(FORECAST_TYPES) + [CATEGORY_FORECAST])
     
     # Slider for number of forecast days
     forecast_periods = st.slider("Pilih berapa hari ke depan untuk prediksi:", 1, 365, 30)
-    
-    # Button to run forecasting
-    if st.button("Jalankan Forecasting"):
-        df_for_forecast = pd.DataFrame()
-        data_type_label = ""
-
-        if forecast_type == "Pendapatan":
-            df_for_forecast = df[df["jenis"] == "pendapatan"].copy()
-            df_for_forecast = df_for_forecast.groupby("tanggal")["jumlah"].sum().reset_index()
-            data_type_label = "pendapatan"
-        elif forecast_type == "Pengeluaran":
-            df_for_forecast = df[df["jenis"] == "pengeluaran"].copy()
-            df_for_forecast = df_for_forecast.groupby("tanggal")["jumlah"].sum().reset_index()
-            data_type_label = "pengeluaran"
-        elif forecast_type == "Keuntungan (Pendapatan - Pengeluaran)":
-            df_pendapatan_daily_df = df[df["jenis"] == "pendapatan"].groupby("tanggal")["jumlah"].sum().reset_index()
-            df_pengeluaran_daily_df = df[df["jenis"] == "pengeluaran"].groupby("tanggal")["jumlah"].sum().reset_index()
-            
-            # Merge to get all dates and corresponding amounts
-            merged_df = pd.merge(df_pendapatan_daily_df, df_pengeluaran_daily_df, 
-                                 on='tanggal', how='outer', suffixes=('_pendapatan', '_pengeluaran'))
-            
-            # Fill NaN values with 0
-            merged_df = merged_df.fillna(0)
-            
-            # Calculate net amount
-            merged_df['jumlah'] = merged_df['jumlah_pendapatan'] - merged_df['jumlah_pengeluaran']
-            
-            df_for_forecast = merged_df[['tanggal', 'jumlah']]
-            data_type_label = "keuntungan"
-
-        df_for_forecast.columns = ["ds", "y"]  # Rename columns for Prophet
-        df_for_forecast["ds"] = pd.to_datetime(df_for_forecast["ds"]) # Ensure 'ds' is datetime
-
-        # Check if there are enough data points for Prophet
-        if len(df_for_forecast) >= 2:
-            try:
-                # Create and fit the model
-                model = Prophet()
-                # Add seasonality if data duration is sufficient
-                if (df_for_forecast['ds'].max() - df_for_forecast['ds'].min()).days >= 365 * 2: # At least 2 years for yearly
-                    model.add_seasonality(name='yearly', period=365.25, fourier_order=10)
-                if (df_for_forecast['ds'].max() - df_for_forecast['ds'].min()).days >= 7 * 2: # At least 2 weeks for weekly
-                    model.add_seasonality(name='weekly', period=7, fourier_order=3)
-
 
-                model.fit(df_for_forecast)
+    # "Cepat" is the NumPy Holt-Winters engine, Prophet the slower but richer model
+    engine_name = st.radio("Mesin Forecasting", list(ENGINES), index=list(ENGINES).index("Prophet"), horizontal=True)
 
-                # Create future dates for forecasting
-                future = model.make_future_dataframe(periods=forecast_periods)  # Use selected periods
-                forecast = model.predict(future)
-
-                # Plot the forecast
-                fig_forecast = model.plot(forecast)
-                st.write(fig_forecast)
+    if forecast_type == CATEGORY_FORECAST:
+        category_forecast_section(username, filters, forecast_periods, engine_name)
+        return
 
-                # --- Display Insights ---
-                st.subheader(f"💡 Insights dari Forecasting {forecast_type}")
-                insights = generate_forecasting_insights(forecast, forecast_periods, data_type_label)
-                for i, insight in enumerate(insights):
-                    st.markdown(f"- {insight}")
-                # --- End Display Insights ---
+    # Button to run forecasting
+    if st.button("Jalankan Forecasting"):
+        df_for_forecast = build_series(df, forecast_type)
+        job = {"forecast_type": forecast_type, "periods": forecast_periods, "engine": engine_name}
 
+        # Check if there are enough data points for forecasting
+        if len(df_for_forecast) >= 2 and not ENGINES[engine_name].cache_fits:
+            # Fast engine: milliseconds, run it right here
+            try:
+                model, forecast = run_forecast(username, forecast_type, df_for_forecast, forecast_periods, engine=engine_name)
+                st.session_state["forecast_result"] = {**job, "model_json": ENGINES[engine_name].to_json(model), "forecast": forecast}
             except Exception as e:
-                st.error(f"Terjadi kesalahan saat melakukan *forecasting* untuk {forecast_type}: {e}. Pastikan data Anda cukup bervariasi dan tidak kosong.")
+                st.session_state["forecast_result"] = {**job, "error": str(e)}
+        elif len(df_for_forecast) >= 2:
+            # The fit runs in the forecast worker pool; forecast_job_status polls for it
+            job_id = forecast_pool.submit(username, forecast_type, df_for_forecast, forecast_periods, data_version(username), engine=engine_name)
+            if job_id is None:
+                st.warning("Masih ada *forecasting* Anda yang sedang diproses. Tunggu hingga selesai.")
+            else:
+                st.session_state["forecast_job"] = {**job, "id": job_id}
+                st.session_state.pop("forecast_result", None)
         else:
             st.info(f"Tidak ada cukup data {forecast_type.lower()} (minimal 2 data poin) untuk melakukan *forecasting*.")
+
+    if "forecast_job" in st.session_state:
+        forecast_job_status()
+
+    result = st.session_state.get("forecast_result")
+    current = result and (result["forecast_type"], result["periods"], result["engine"]) == (forecast_type, forecast_periods, engine_name)
+    if not current and not filters and engine_name == "Prophet" and "forecast_job" not in st.session_state:
+        # Unfiltered view: show the nightly batch forecast if it was built from the current data
+        precomputed = load_precomputed(username, forecast_type, forecast_periods, data_version(username))
+        if precomputed:
+            result = precomputed
+            st.caption(f"Hasil *forecasting* dihitung otomatis pada {precomputed['created_at']}. Klik **Jalankan Forecasting** untuk menghitung ulang.")
+    if result and "error" in result:
+        st.error(f"Terjadi kesalahan saat melakukan *forecasting* untuk {result['forecast_type']}: {result['error']}. Pastikan data Anda cukup bervariasi dan tidak kosong.")
+    elif result:
+        # Plot the forecast; built once per result, not on every rerun
+        engine = ENGINES[result["engine"]]
+        build = lambda: engine.plot(engine.from_json(result["model_json"]), result["forecast"])
+        if "created_at" in result:  # nightly batch result, loaded again on each rerun
+            fig_forecast = charts.cached_figure(("forecast", username, data_version(username), forecast_type, forecast_periods), build)
+        else:
+            fig_forecast = result.get("figure")
+            if fig_forecast is None:
+                fig_forecast = result["figure"] = build()
+        st.plotly_chart(fig_forecast)
+
+        # --- Display Insights ---
+        st.subheader(f"💡 Insights dari Forecasting {result['forecast_type']}")
+        insights = result.get("insights") or generate_forecasting_insights(result["forecast"], result["periods"], FORECAST_TYPES[result["forecast_type"]])
+        for i, insight in enumerate(insights):
+            st.markdown(f"- {insight}")
+        # --- End Display Insights ---
     # --- End Forecasting Section ---
 
 
 def riwayat_page():
+    from xpense.queries import (
+        RIWAYAT_PAGE_SIZE, count_search, count_transactions, kategori_options, search_transactions, transactions_page,
+    )
+
     st.title("📜 Riwayat Input Keuangan")
     username = st.session_state["username"]
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM laporan_keuangan WHERE username = ?", conn, params=(username,))
-    conn.close()
 
-    if df.empty:
-        st.warning("Belum ada data.")
-        return
-
-    df["tanggal"] = pd.to_datetime(df["tanggal"]).dt.date
+    # Filter dan urutan dijalankan di SQL; hanya satu halaman yang diambil
+    cari = st.text_input("🔍 Cari keterangan atau kategori", key="riwayat_cari", placeholder="Contoh: tepung, token listrik").strip()
+    with st.expander("🔎 Filter & Urutan"):
+        col1, col2 = st.columns(2)
+        jenis_filter = col1.selectbox("Jenis", ["Semua", "Pendapatan", "Pengeluaran"], key="riwayat_jenis")
+        filters = {} if jenis_filter == "Semua" else {"jenis": jenis_filter}
+        kategori_filter = col2.selectbox("Kategori", ["Semua"] + kategori_options(username, jenis=filters.get("jenis")), key="riwayat_kategori")
+        if kategori_filter != "Semua":
+            filters["kategori"] = kategori_filter
+        rentang = st.date_input("Rentang Tanggal", [], key="riwayat_rentang")
+        if len(rentang) == 2:
+            filters["rentang"] = rentang
+        col1, col2 = st.columns(2)
+        urutan = col1.selectbox("Urutkan", ["Terbaru", "Terlama"], key="riwayat_urutan")
+        page_size = col2.selectbox("Baris per halaman", [10, 20, 50, 100], index=[10, 20, 50, 100].index(RIWAYAT_PAGE_SIZE), key="riwayat_page_size")
+
+    export_section(username, filters, "riwayat_export")
+
+    # Cursor stack for keyset paging, or offsets while searching (ranked
+    # results have no stable key); any filter change starts again at page 1
+    view = (cari, jenis_filter, kategori_filter, tuple(rentang), urutan, page_size)
+    if st.session_state.get("riwayat_view") != view:
+        st.session_state["riwayat_view"] = view
+        st.session_state["riwayat_cursors"] = [None]
+    cursors = st.session_state["riwayat_cursors"]
+
+    if cari:
+        total = count_search(username, cari, **filters)
+        if total == 0:
+            st.warning(f"Tidak ada transaksi yang cocok dengan \"{cari}\".")
+            return
+        rows = search_transactions(username, cari, offset=cursors[-1] or 0, page_size=page_size, newest_first=urutan == "Terbaru", **filters)
+    else:
+        total = count_transactions(username, **filters)
+        if total == 0:
+            st.warning("Belum ada data." if not filters else "Tidak ada data untuk filter yang dipilih.")
+            return
+        rows = transactions_page(username, after=cursors[-1], page_size=page_size, newest_first=urutan == "Terbaru", **filters)
+    first = (len(cursors) - 1) * page_size + 1
+    st.caption(f"Menampilkan {first}–{first + len(rows) - 1} dari {total} transaksi")
 
-    for index, row in df.iterrows():
+    for row in rows:
+        row["tanggal"] = datetime.fromisoformat(row["tanggal"]).date()
         with st.expander(f"{row['tanggal']} - {row['kategori']} - Rp{row['jumlah']:,.0f}".replace(",", ".")):
             st.write(f"*Jenis:* {row['jenis'].capitalize()}")
             st.write(f"*Jumlah:* Rp {row['jumlah']:,.0f}".replace(",", "."))
             st.write(f"*Dana Darurat:* Rp {row['dana_darurat']:,.0f}".replace(",", "."))
             st.write(f"*Keterangan:* {row['keterangan']}")
-            if row['bukti_img']:
-                st.image(row['bukti_img'], width=200)
+            # The receipt is fetched only when the user asks for it
+            if row['bukti_ref'] and st.toggle("🖼️ Lihat bukti", key=f"bukti_{row['id']}"):
+                st.image(get_thumbnail(row['bukti_ref']), width=200)
+                if st.toggle("Ukuran penuh", key=f"bukti_full_{row['id']}"):
+                    st.image(get_blob(row['bukti_ref']))
 
             col1, col2 = st.columns(2)
             if col1.button("📝 Edit", key=f"edit_{row['id']}"):
                 with st.form(f"form_edit_{row['id']}"):
                     new_tanggal = st.date_input("Tanggal", value=row['tanggal'], key=f"tgl_{row['id']}")
-                    new_jenis = st.selectbox("Jenis", ["Pendapatan", "Pengeluaran"], index=0 if row['jenis'].lower() == "pendapatan" else 1, key=f"jenis_{row['id']}")
+                    new_jenis = st.selectbox("Jenis", JENIS, index=0 if row['jenis'].lower() == "pendapatan" else 1, key=f"jenis_{row['id']}")
                     new_kategori = st.selectbox("Kategori",
-                        ["Keuntungan"] if new_jenis == "Pendapatan" else ["Listrik", "Gaji", "PDAM", "Bahan Baku", "Sewa Tempat", "Lain-lain"],
+                        KATEGORI[new_jenis],
                         index=0, key=f"kat_{row['id']}")
                     new_jumlah = st.number_input("Jumlah", value=row['jumlah'], step=1000, key=f"jml_{row['id']}")
                     new_keterangan = st.text_input("Keterangan", value=row['keterangan'], key=f"ket_{row['id']}")
@@ -533,37 +655,35 @@ def riwayat_page():
                         emergency_rate, _ = get_user_settings(username) # Get current rate
                         new_dana_darurat = int(new_jumlah * (emergency_rate / 100)) if new_jenis == "Pendapatan" else 0
 
-                        conn = get_connection()
-                        cursor = conn.cursor()
-                        cursor.execute("""
-                            UPDATE laporan_keuangan
-                            SET tanggal = ?, kategori = ?, jenis = ?, jumlah = ?, dana_darurat = ?, keterangan = ?
-                            WHERE id = ? AND username = ?
-                        """, (new_tanggal.isoformat(), new_kategori, new_jenis, new_jumlah, new_dana_darurat, new_keterangan, row['id'], username))
-                        conn.commit()
-                        conn.close()
+                        update_transaction(username, row['id'], new_tanggal.isoformat(), new_kategori, new_jenis, new_jumlah, new_dana_darurat, new_keterangan)
                         st.success("✅ Data berhasil diperbarui.")
                         st.rerun()
 
             if col2.button("🗑️ Hapus", key=f"hapus_{row['id']}"):
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM laporan_keuangan WHERE id = ? AND username = ?", (row['id'], username))
-                conn.commit()
-                conn.close()
+                delete_transaction(username, row['id'])
                 st.success("✅ Data berhasil dihapus.")
                 st.rerun()
 
+    col1, _, col2 = st.columns([1, 2, 1])
+    if len(cursors) > 1 and col1.button("⬅️ Sebelumnya", key="riwayat_prev"):
+        cursors.pop()
+        st.rerun()
+    if first + len(rows) - 1 < total and col2.button("Berikutnya ➡️", key="riwayat_next"):
+        last = rows[-1]
+        cursors.append(first - 1 + len(rows) if cari else (last["tanggal"].isoformat(), last["id"]))
+        st.rerun()
+
 def akun_page():
     st.markdown("<h1 style='text-align: center;'>👤 Akun Saya</h1>", unsafe_allow_html=True)
     username = st.session_state["username"]
-    _, profile_pic = get_user_settings(username) # Only need profile_pic here now
+    _, profile_ref = get_user_settings(username) # Only need profile_pic here now
+    profile_pic = get_thumbnail(profile_ref)
     if profile_pic:
         encoded = base64.b64encode(profile_pic).decode()
         st.markdown(
             f"""
             <div style='text-align: center;'>
-                <img src="data:image/png;base64,{encoded}" style="width: 200px; height: 200px; object-fit: cover; border-radius: 50%;">
+                <img src="data:{MIME_TYPE};base64,{encoded}" style="width: 200px; height: 200px; object-fit: cover; border-radius: 50%;">
             </div>
             """, unsafe_allow_html=True)
     else:
@@ -571,15 +691,81 @@ def akun_page():
     uploaded_pic = st.file_uploader("Upload Foto Profil (opsional)", type=["jpg", "jpeg", "png"])
     if uploaded_pic:
         img = uploaded_pic.read()
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET profile_pic = ? WHERE username = ?", (img, username))
-        conn.commit()
-        conn.close()
-        st.success("✅ Foto profil berhasil diperbarui.")
-        st.rerun()
+        try:
+            set_profile_pic(username, img)
+        except InvalidImageError as e:
+            st.error(str(e))
+        else:
+            st.success("✅ Foto profil berhasil diperbarui.")
+            st.rerun()
     # Removed "Pengaturan Dana Darurat" from here
 
+def analytics_page():
+    # Aggregated across all users in SQL (xpense.admin); nothing per user is
+    # loaded into memory, and results are reused for admin.CACHE_TTL seconds.
+    import pandas as pd
+    from xpense import admin
+
+    st.title("📈 Analitik Seluruh Pengguna")
+    periode = {"7 hari": 7, "30 hari": 30, "90 hari": 90, "1 tahun": 365, "Semua": 0}
+    col1, col2 = st.columns([3, 1])
+    pilihan = col1.selectbox("Periode", list(periode), index=1)
+    if col2.button("Muat ulang"):
+        admin.clear_cache()
+    dari, sampai = admin.period(periode[pilihan])
+    st.caption(f"Data {dari or 'awal'} s.d. {sampai}. Disimpan sementara {admin.CACHE_TTL:.0f} detik.")
+
+    ringkasan = admin.overview(dari, sampai)
+    cols = st.columns(5)
+    cols[0].metric("User Terdaftar", f"{ringkasan['user_terdaftar']:,}".replace(",", "."))
+    cols[1].metric("User Aktif", f"{ringkasan['user_aktif']:,}".replace(",", "."))
+    cols[2].metric("Transaksi", f"{ringkasan['transaksi']:,}".replace(",", "."))
+    cols[3].metric("Pendapatan", f"Rp {ringkasan['pendapatan']:,.0f}".replace(",", "."))
+    cols[4].metric("Pengeluaran", f"Rp {ringkasan['pengeluaran']:,.0f}".replace(",", "."))
+
+    volume = admin.daily_volume(dari, sampai)
+    if not volume:
+        st.info("Tidak ada transaksi pada periode ini.")
+        return
+    st.subheader("Volume Transaksi per Hari")
+    volume = pd.DataFrame(volume)
+    volume["tanggal"] = pd.to_datetime(volume["tanggal"])
+    st.line_chart(volume.set_index("tanggal")[["transaksi", "user_aktif"]])
+
+    st.subheader("Total per Kategori")
+    st.dataframe(admin.kategori_totals(dari, sampai), hide_index=True, use_container_width=True)
+
+    st.subheader("Akun Terbesar")
+    st.dataframe(admin.top_accounts(dari, sampai), hide_index=True, use_container_width=True)
+
+def diagnostics_page():
+    st.title("🩺 Diagnostik Performa")
+    st.caption(f"Metrik proses ini sejak dimulai. File untuk scraper: `{metrics.METRICS_FILE or '-'}`")
+
+    col1, col2 = st.columns(2)
+    if col1.button("Tulis file sekarang"):
+        metrics.flush(force=True)
+    if col2.button("Reset metrik"):
+        metrics.reset()
+
+    series = metrics.snapshot()
+    if not series:
+        st.info("Belum ada data metrik.")
+        return
+    for metric in sorted({item["metric"] for item in series}):
+        # Durations are shown in ms, everything else as is
+        scale, unit = (1000, " (ms)") if metric.endswith("_seconds") else (1, "")
+        rows = [{
+            "Label": ", ".join(f"{k}={v}" for k, v in item["labels"].items()),
+            "Jumlah": item["count"],
+            f"Total{unit}": item["sum"] * scale,
+            f"Rata-rata{unit}": item["sum"] / item["count"] * scale,
+            f"Maks{unit}": item["max"] * scale,
+        } for item in series if item["metric"] == metric]
+        rows.sort(key=lambda row: row[f"Total{unit}"], reverse=True)
+        st.subheader(metric)
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
 # New function for the minimalist login/register layout
 def login_register_page():
     # Stylish CSS background with green gradient and cleaner layout
@@ -692,7 +878,7 @@ def login_register_page():
 
 
 def main():
-    initialize_db()
+    migrate()
     st.set_page_config(
         page_title="Xpense",
         layout="wide",
@@ -732,21 +918,32 @@ def main():
             st.session_state["current_page"] = "Riwayat"
         if st.sidebar.button("👤 Akun"):
             st.session_state["current_page"] = "Akun"
+        if st.session_state.get("role") == "admin" and st.sidebar.button("📈 Analitik"):
+            st.session_state["current_page"] = "Analitik"
+        if st.session_state.get("role") == "admin" and st.sidebar.button("🩺 Diagnostik"):
+            st.session_state["current_page"] = "Diagnostik"
         if st.sidebar.button("🚪 Logout"):
             st.session_state.clear()
             st.rerun()
         st.sidebar.markdown('</div>', unsafe_allow_html=True) # Close the container
 
         # Render the current page based on session state
-        if st.session_state["current_page"] == "Home":
-            home_page()
-        elif st.session_state["current_page"] == "Dashboard":
-            dashboard_page()
-        elif st.session_state["current_page"] == "Riwayat":
-            riwayat_page()
-        elif st.session_state["current_page"] == "Akun":
-            akun_page()
-            
+        page = st.session_state["current_page"]
+        with metrics.timer("page_render_seconds", page=page):
+            if page == "Home":
+                home_page()
+            elif page == "Dashboard":
+                dashboard_page()
+            elif page == "Riwayat":
+                riwayat_page()
+            elif page == "Akun":
+                akun_page()
+            elif page == "Analitik" and st.session_state.get("role") == "admin":
+                analytics_page()
+            elif page == "Diagnostik" and st.session_state.get("role") == "admin":
+                diagnostics_page()
+        metrics.flush()
+
     else:
         login_register_page() # Call the new login/register page function
 
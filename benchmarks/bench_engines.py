@@ -0,0 +1,85 @@
+"""Fit time and holdout accuracy of the forecasting engines.
+
+    python -m benchmarks.bench_engines                 # synthetic ledgers
+    python -m benchmarks.bench_engines --db users.db   # real ledgers as well
+
+The last --holdout days of every series are hidden from the fit and used to
+score the forecast (MAE, and how often the truth falls inside the interval).
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.engines import ENGINES
+from xpense.forecasting import FORECAST_TYPES, build_series, seasonality_config
+from xpense.queries import daily_summary
+
+
+def synthetic_series(years, seed):
+    # Daily cash flow with growth, a weekly and a yearly cycle, noise and ~25% of days missing.
+    rng = np.random.default_rng(seed)
+    days = int(365 * years)
+    t = np.arange(days)
+    y = (
+        2_000_000
+        + 1_500 * t
+        + 400_000 * np.sin(2 * np.pi * t / 7)
+        + 300_000 * np.sin(2 * np.pi * t / 365.25)
+        + rng.normal(0, 200_000, days)
+    )
+    series = pd.DataFrame({"ds": pd.date_range("2021-01-01", periods=days, freq="D"), "y": y.round()})
+    return series[rng.random(days) > 0.25].reset_index(drop=True)
+
+
+def real_series(path, limit):
+    db.DB_NAME = path
+    with get_connection() as conn:
+        usernames = [row[0] for row in conn.execute("SELECT username FROM users ORDER BY username LIMIT ?", (limit,))]
+    for username in usernames:
+        daily = daily_summary(username)
+        if daily.empty:
+            continue
+        for forecast_type in FORECAST_TYPES:
+            series = build_series(daily, forecast_type)
+            if len(series) >= 60:
+                yield f"{username}/{FORECAST_TYPES[forecast_type]}", series
+
+
+def evaluate(engine, series, holdout):
+    cutoff = series["ds"].max() - pd.Timedelta(days=holdout)
+    train, test = series[series["ds"] <= cutoff], series[series["ds"] > cutoff]
+    started = time.perf_counter()
+    model = engine.fit(train, seasonality_config(train))
+    forecast = engine.predict(model, holdout)
+    elapsed = time.perf_counter() - started
+    scored = test.merge(forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]], on="ds")
+    mae = (scored["y"] - scored["yhat"]).abs().mean()
+    coverage = ((scored["y"] >= scored["yhat_lower"]) & (scored["y"] <= scored["yhat_upper"])).mean()
+    return elapsed, mae, coverage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="juga uji ledger nyata dari database ini")
+    parser.add_argument("--users", type=int, default=5, help="jumlah user dari --db")
+    parser.add_argument("--holdout", type=int, default=30)
+    parser.add_argument("--engine", action="append", choices=list(ENGINES), help="default: semua engine")
+    args = parser.parse_args()
+
+    cases = [(f"sintetis {years} th", synthetic_series(years, seed)) for seed, years in enumerate((1, 2, 3))]
+    if args.db:
+        cases.extend(real_series(args.db, args.users))
+
+    print(f"{'series':<28}{'engine':<10}{'titik':>7}{'fit+predict':>14}{'MAE (Rp)':>16}{'cakupan 80%':>13}")
+    for label, series in cases:
+        for name in args.engine or list(ENGINES):
+            elapsed, mae, coverage = evaluate(ENGINES[name], series, args.holdout)
+            print(f"{label:<28}{name:<10}{len(series):>7}{elapsed * 1000:>12.0f}ms{mae:>16,.0f}{coverage:>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Query latency on laporan_keuangan before and after the index migration.
+
+    python -m benchmarks.bench_indexes --rows 2000000 --users 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from xpense.db import get_connection
+from xpense.ledger import KATEGORI
+from xpense.migrations import MIGRATIONS, _add_ledger_indexes, migrate
+
+QUERIES = {
+    "riwayat (semua baris user)": (
+        "SELECT * FROM laporan_keuangan WHERE username = ?",
+        lambda user: (user,),
+    ),
+    "ringkasan harian": (
+        "SELECT tanggal, jenis, SUM(jumlah) FROM laporan_keuangan WHERE username = ? GROUP BY tanggal, jenis",
+        lambda user: (user,),
+    ),
+    "jenis + kategori + tahun": (
+        "SELECT SUM(jumlah) FROM laporan_keuangan WHERE username = ? AND jenis = ? AND kategori = ? "
+        "AND tanggal >= ? AND tanggal < ?",
+        lambda user: (user, "Pengeluaran", "Listrik", "2024-01-01", "2025-01-01"),
+    ),
+}
+
+
+def _rows(count, users, start):
+    for _ in range(count):
+        jenis = "Pendapatan" if random.random() < 0.4 else "Pengeluaran"
+        jumlah = random.randint(10, 5000) * 1000
+        yield (
+            f"user{random.randrange(users)}",
+            (start + timedelta(days=random.randrange(3 * 365))).isoformat(),
+            random.choice(KATEGORI[jenis]),
+            jenis,
+            jumlah,
+            jumlah // 10 if jenis == "Pendapatan" else 0,
+            "",
+        )
+
+
+def fill(path, rows, users, batch=100_000):
+    start = date(2022, 1, 1)
+    with get_connection(path) as conn:
+        for offset in range(0, rows, batch):
+            conn.executemany(
+                "INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _rows(min(batch, rows - offset), users, start),
+            )
+
+
+def measure(path, users, repeat):
+    results = {}
+    with get_connection(path) as conn:
+        for name, (sql, params) in QUERIES.items():
+            timings = []
+            for i in range(repeat):
+                user = f"user{(i * 7919) % users}"
+                started = time.perf_counter()
+                conn.execute(sql, params(user)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    path = os.path.join(tempfile.mkdtemp(prefix="xpense-bench-"), "bench.db")
+    migrate(path, target=1)
+    print(f"Mengisi {args.rows:,} baris untuk {args.users:,} user di {path} ...")
+    fill(path, args.rows, args.users)
+
+    before = measure(path, args.users, args.repeat)
+    started = time.perf_counter()
+    # Only the index step; later migrations would change what is measured
+    migrate(path, target=MIGRATIONS.index(_add_ledger_indexes) + 1)
+    migration_time = time.perf_counter() - started
+    after = measure(path, args.users, args.repeat)
+
+    print(f"Migrasi indeks: {migration_time:.1f} s")
+    print(f"{'query':<30}{'sebelum (ms)':>15}{'sesudah (ms)':>15}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:<30}{before[name]:>15.2f}{after[name]:>15.2f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Import-time regression check for the login path.
+
+    python -m benchmarks.check_import_time [--budget-ms 1000]
+
+Starts a fresh interpreter under -X importtime, imports Test.py and runs what
+the login page needs (migrations and a login attempt). Exits with status 1 if
+a heavy module (pandas, prophet, plotly.express, ...) got imported on the way
+or if importing Test.py took longer than the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the Dashboard/Riwayat pages and the forecasting stack may import these.
+# Streamlit itself imports the bare PIL package for its version, so Pillow is
+# guarded through PIL.Image, which decoding images needs.
+HEAVY_MODULES = ("pandas", "numpy", "prophet", "cmdstanpy", "plotly.express", "matplotlib", "pyarrow", "PIL.Image")
+
+LOGIN_PATH = "import Test; Test.migrate(); Test.login_user('tidak-ada', 'x')"
+
+
+def measure():
+    env = dict(os.environ, XPENSE_DB=os.path.join(tempfile.mkdtemp(prefix="xpense-import-"), "users.db"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOGIN_PATH],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, total_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        cumulative[name] = int(total_us)
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    cumulative = measure()
+    total_ms = cumulative["Test"] / 1000
+    heavy = sorted(name for name in cumulative if name in HEAVY_MODULES)
+
+    print(f"import Test: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, total_us in sorted(cumulative.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {total_us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"GAGAL: modul berat ikut ter-import di jalur login: {', '.join(heavy)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("GAGAL: waktu import melebihi budget.")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Fill a database with synthetic users and ledgers.
+
+    python -m benchmarks.generate --db bench.db --users 100 --transactions 5000
+    python -m benchmarks.generate --db bench.db --images 0.05 --years 5
+
+Every user is user0, user1, ... with the password "benchmark". The same
+--seed always produces the same ledgers.
+"""
+import argparse
+import io
+import os
+from datetime import date
+
+import bcrypt
+import numpy as np
+
+from xpense import db
+from xpense.blobs import put_blob
+from xpense.db import get_connection
+from xpense.images import ingest
+from xpense.ledger import KATEGORI
+from xpense.migrations import migrate
+
+PASSWORD = "benchmark"
+END_DATE = date(2025, 12, 31)
+PENDAPATAN_SHARE = 0.4
+# Share of expense rows and median amount (Rp) per kategori, roughly what a
+# small shop records: frequent small purchases, monthly bills and salaries.
+PENGELUARAN = {
+    "Bahan Baku": (0.45, 500_000),
+    "Lain-lain": (0.20, 100_000),
+    "Gaji": (0.12, 2_500_000),
+    "Listrik": (0.08, 400_000),
+    "Sewa Tempat": (0.08, 3_000_000),
+    "PDAM": (0.07, 150_000),
+}
+PENDAPATAN_MEDIAN = 1_500_000
+assert set(PENGELUARAN) == set(KATEGORI["Pengeluaran"])
+# Notes per kategori for the search index; a share of rows has none.
+KETERANGAN = {
+    "Keuntungan": ["penjualan harian", "pesanan katering", "penjualan online", "pembayaran pelanggan", "titipan warung"],
+    "Bahan Baku": ["beli tepung terigu", "beli gula pasir", "beli telur ayam", "beli minyak goreng", "beli bumbu dapur",
+                   "beli kemasan plastik"],
+    "Lain-lain": ["ongkos kirim", "perbaikan peralatan", "alat kebersihan", "bensin motor", "sumbangan warga"],
+    "Gaji": ["gaji karyawan", "upah harian", "bonus karyawan"],
+    "Listrik": ["token listrik", "tagihan PLN"],
+    "Sewa Tempat": ["sewa kios", "sewa ruko bulanan"],
+    "PDAM": ["tagihan air PDAM"],
+}
+KETERANGAN_SHARE = 0.7
+
+
+def _images(rng, count):
+    # Noise photos at phone-camera size, run through the same ingest as uploads.
+    from PIL import Image
+
+    refs = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, "JPEG", quality=85)
+        refs.append(ingest(buffer.getvalue()))
+    return refs
+
+
+def ledger_rows(rng, username, transactions, years, emergency_rate, image_refs, image_share):
+    days = int(365 * years)
+    offsets = np.sort(rng.integers(0, days, transactions))
+    tanggal = np.datetime64(END_DATE) - days + 1 + offsets
+    pendapatan = rng.random(transactions) < PENDAPATAN_SHARE
+
+    names = list(PENGELUARAN)
+    weights = np.array([PENGELUARAN[name][0] for name in names])
+    medians = np.array([PENGELUARAN[name][1] for name in names])
+    choice = rng.choice(len(names), transactions, p=weights / weights.sum())
+    median = np.where(pendapatan, PENDAPATAN_MEDIAN, medians[choice])
+    jumlah = (median * rng.lognormal(0, 0.6, transactions) / 1000).round().astype(np.int64) * 1000
+    jumlah = np.maximum(jumlah, 1000)
+    kategori = np.where(pendapatan, KATEGORI["Pendapatan"][0], np.array(names)[choice])
+    dana_darurat = np.where(pendapatan, jumlah * emergency_rate // 100, 0)
+
+    keterangan = [""] * transactions
+    picks = rng.integers(0, 1 << 30, transactions)
+    for i in np.flatnonzero(rng.random(transactions) < KETERANGAN_SHARE):
+        notes = KETERANGAN[kategori[i]]
+        keterangan[i] = notes[picks[i] % len(notes)]
+
+    bukti = [None] * transactions
+    if image_refs:
+        for i in np.flatnonzero(rng.random(transactions) < image_share):
+            bukti[i] = image_refs[rng.integers(len(image_refs))]
+    for i in range(transactions):
+        yield (
+            username,
+            str(tanggal[i]),
+            str(kategori[i]),
+            "Pendapatan" if pendapatan[i] else "Pengeluaran",
+            int(jumlah[i]),
+            int(dana_darurat[i]),
+            keterangan[i],
+            bukti[i],
+        )
+
+
+def generate(path, users, transactions, years=3.0, image_share=0.0, image_pool=20, seed=42):
+    rng = np.random.default_rng(seed)
+    migrate(path)
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt())
+    images = _images(rng, image_pool) if image_share > 0 else []
+    with get_connection(path) as conn:
+        image_refs = [put_blob(conn, image, thumb) for image, thumb in images]
+    for u in range(users):
+        username = f"user{u}"
+        emergency_rate = int(rng.integers(5, 11))
+        with get_connection(path) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO users (username, password_hash, role, emergency_rate) VALUES (?, ?, 'user', ?)",
+                (username, password_hash, emergency_rate),
+            )
+            conn.executemany(
+                "INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_ref) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ledger_rows(rng, username, transactions, years, emergency_rate, image_refs, image_share),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=5_000, help="transaksi per user")
+    parser.add_argument("--years", type=float, default=3.0, help="rentang riwayat, berakhir 31-12-2025")
+    parser.add_argument("--images", type=float, default=0.0, help="bagian transaksi dengan bukti gambar (0-1)")
+    parser.add_argument("--image-pool", type=int, default=20, help="jumlah gambar berbeda yang dipakai ulang")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} sudah ada; pakai file baru agar hasil dapat diulang")
+    generate(args.db, args.users, args.transactions, args.years, args.images, args.image_pool, args.seed)
+    print(f"{args.users:,} user x {args.transactions:,} transaksi ditulis ke {args.db}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Time the app's hot paths and store the results as JSON.
+
+    python -m benchmarks.run                              # fresh synthetic database
+    python -m benchmarks.run --db bench.db --skip-prophet
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+Each case runs once as warm-up and then --repeat times; the JSON file holds
+min/median/mean/p95/max in milliseconds together with the commit, the
+environment and the database size, so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.bench_engines import synthetic_series
+from benchmarks.generate import PASSWORD, generate
+from xpense import db, metrics
+from xpense.db import get_connection
+from xpense.migrations import migrate
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _time(fn, repeat):
+    fn(0)  # warm-up: imports, page cache, prepared statements
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "max_ms": timings[-1],
+    }
+
+
+def ledger_cases(users):
+    from xpense.forecasting import FORECAST_TYPES, build_series
+    from xpense.queries import (
+        count_search, count_transactions, daily_summary, has_transactions, kategori_options, search_transactions,
+        tahun_options, transactions_page,
+    )
+
+    def user(i):
+        return users[i % len(users)]
+
+    def dashboard(**filters):
+        def run(i):
+            daily = daily_summary(user(i), **filters)
+            for forecast_type in FORECAST_TYPES:
+                build_series(daily, forecast_type)
+        return run
+
+    def dashboard_options(i):
+        has_transactions(user(i))
+        kategori_options(user(i))
+        kategori_options(user(i), jenis="Pengeluaran")
+        tahun_options(user(i))
+
+    def riwayat(**filters):
+        def run(i):
+            count_transactions(user(i), **filters)
+            transactions_page(user(i), **filters)
+        return run
+
+    def cari(text, **filters):
+        def run(i):
+            count_search(user(i), text, **filters)
+            search_transactions(user(i), text, **filters)
+        return run
+
+    # The (tanggal, id) cursor 50 pages deep, found once per user up front.
+    deep = {}
+    for username in users:
+        after = None
+        for _ in range(50):
+            rows = transactions_page(username, after=after)
+            if not rows:
+                break
+            after = (rows[-1]["tanggal"], rows[-1]["id"])
+        deep[username] = after
+
+    end = date(2025, 12, 31)
+    return {
+        "dashboard/tanpa filter": (dashboard(), 1),
+        "dashboard/jenis+kategori": (dashboard(jenis="Pengeluaran", kategori="Bahan Baku"), 1),
+        "dashboard/tahun": (dashboard(tahun=2025), 1),
+        "dashboard/rentang 90 hari": (dashboard(rentang=(end - timedelta(days=89), end)), 1),
+        "dashboard/opsi filter": (dashboard_options, 1),
+        "riwayat/halaman pertama": (riwayat(), 1),
+        "riwayat/filter jenis": (riwayat(jenis="Pendapatan"), 1),
+        "riwayat/halaman ke-50": (lambda i: transactions_page(user(i), after=deep[user(i)]), 1),
+        "riwayat/cari kata umum": (cari("beli"), 1),
+        "riwayat/cari prefiks+jenis": (cari("tep", jenis="Pengeluaran"), 1),
+    }
+
+
+def login_cases(users):
+    from Test import login_user
+
+    def run(i):
+        ok, _ = login_user(users[i % len(users)], PASSWORD)
+        assert ok
+    # bcrypt at cost 12 takes a few hundred ms per check; a few rounds are enough.
+    return {"login/bcrypt": (run, 0.2)}
+
+
+def insights_cases(users):
+    from xpense.engines import ENGINES
+    from xpense.forecasting import FORECAST_TYPES, build_series, generate_forecasting_insights
+    from xpense.queries import daily_summary
+
+    engine = ENGINES["Cepat"]
+    series = build_series(daily_summary(users[0]), "Pendapatan")
+    forecast = engine.predict(engine.fit(series, []), 30)
+    return {
+        "insights/30 hari": (lambda i: generate_forecasting_insights(forecast, 30, FORECAST_TYPES["Pendapatan"]), 1),
+    }
+
+
+def prophet_cases(years_list):
+    from xpense.engines import ENGINES
+    from xpense.forecasting import seasonality_config
+
+    engine = ENGINES["Prophet"]
+    cases = {}
+    for years in years_list:
+        series = synthetic_series(years, seed=years)
+        seasonalities = seasonality_config(series)
+        cases[f"prophet/fit {years} th"] = (
+            lambda i, series=series, seasonalities=seasonalities: engine.fit(series, seasonalities), 0.1,
+        )
+    return cases
+
+
+def compare(previous_path, results):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nDibanding {previous.get('commit') or '?'} ({previous['timestamp']}):")
+    print(f"{'kasus':<32}{'sebelum (ms)':>14}{'sekarang (ms)':>15}{'selisih':>10}")
+    for name, result in results.items():
+        old = previous["results"].get(name)
+        if old is None:
+            continue
+        change = result["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0
+        print(f"{name:<32}{old['median_ms']:>14.2f}{result['median_ms']:>15.2f}{change:>+10.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database dari benchmarks.generate (default: buat baru di direktori sementara)")
+    parser.add_argument("--users", type=int, default=20, help="untuk database baru")
+    parser.add_argument("--transactions", type=int, default=5_000, help="transaksi per user, untuk database baru")
+    parser.add_argument("--years", type=float, default=3.0, help="rentang riwayat, untuk database baru")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--prophet-years", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--skip-prophet", action="store_true")
+    parser.add_argument("--only", help="hanya kasus yang namanya memuat teks ini")
+    parser.add_argument("--output", default=RESULTS_DIR, help="direktori hasil JSON")
+    parser.add_argument("--compare", help="file hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="xpense-bench-"), "bench.db")
+        print(f"Membuat {args.users} user x {args.transactions:,} transaksi di {path} ...")
+        generate(path, args.users, args.transactions, args.years)
+    db.DB_NAME = path
+    migrate()
+    with get_connection() as conn:
+        users = [row[0] for row in conn.execute("SELECT username FROM users ORDER BY username")]
+        rows = conn.execute("SELECT COUNT(*) FROM laporan_keuangan").fetchone()[0]
+
+    # Every case is (fn(i), share of --repeat it runs)
+    cases = {}
+    for build in (ledger_cases, login_cases, insights_cases):
+        cases.update(build(users))
+    if not args.skip_prophet:
+        cases.update(prophet_cases(args.prophet_years))
+    if args.only:
+        cases = {name: case for name, case in cases.items() if args.only in name}
+
+    results = {}
+    print(f"{'kasus':<32}{'median (ms)':>13}{'p95 (ms)':>12}{'ulang':>7}")
+    for name, (fn, share) in cases.items():
+        results[name] = _time(fn, max(3, int(args.repeat * share)))
+        print(f"{name:<32}{results[name]['median_ms']:>13.2f}{results[name]['p95_ms']:>12.2f}{results[name]['repeat']:>7}")
+
+    commit = _git("rev-parse", "--short=12", "HEAD")
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+            "metrics_enabled": metrics.ENABLED,
+        },
+        "database": {"path": path, "users": len(users), "transactions": rows},
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    out = os.path.join(args.output, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan ke {out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Importing CSV/XLSX rows: parsing, validation and how they reach the ledger.
+
+    python -m pytest -q tests
+"""
+import pandas as pd
+import pytest
+
+from xpense import db, writer
+from xpense.db import get_connection
+from xpense.importer import ImportInterrupted, _parse_jumlah, import_transactions, validate_chunk
+from xpense.migrations import migrate
+
+
+@pytest.mark.parametrize("text, jumlah", [
+    ("1500000", 1_500_000),
+    ("Rp 1.500.000", 1_500_000),
+    ("rp. 1.500.000", 1_500_000),
+    ("Rp2.000", 2_000),
+    ("1,500,000", 1_500_000),
+    ("1.500.000,00", 1_500_000),
+    ("1,500,000.00", 1_500_000),
+    ("1500000,00", 1_500_000),
+    ("12.500,40", 12_500),
+    (" 750 ", 750),
+])
+def test_jumlah_text_accepted(text, jumlah):
+    assert _parse_jumlah(pd.Series([text], dtype=object)).tolist() == [jumlah]
+
+
+@pytest.mark.parametrize("text", [
+    "-500000", "Rp -2.000", "12abc", "1e6", "1.500.5", "1.50.000", "1,500.000,00", "15 000", "Rp", "",
+])
+def test_jumlah_text_rejected(text):
+    assert _parse_jumlah(pd.Series([text], dtype=object)).isna().all()
+
+
+def test_jumlah_numeric_cells_kept():
+    assert _parse_jumlah(pd.Series([2500.0, 1_000_000, -3], dtype=object)).tolist() == [2500, 1_000_000, -3]
+
+
+def test_invalid_jumlah_is_a_row_error():
+    chunk = pd.DataFrame({
+        "tanggal": ["2025-01-02"] * 5,
+        "jenis": ["Pengeluaran"] * 5,
+        "kategori": ["Listrik"] * 5,
+        "jumlah": ["-500000", "1.500.000,00", "Rp 2.000", "12abc", "1e6"],
+    })
+    rows, errors = validate_chunk(chunk, emergency_rate=10)
+    assert [row[3] for row in rows] == [1_500_000, 2_000]
+    assert errors == [(0, "Jumlah tidak valid"), (3, "Jumlah tidak valid"), (4, "Jumlah tidak valid")]
+
+
+def test_numeric_jumlah_must_be_positive():
+    chunk = pd.DataFrame({"tanggal": ["2025-01-02"], "jenis": ["Pengeluaran"], "kategori": ["Listrik"], "jumlah": [-3]})
+    assert validate_chunk(chunk, emergency_rate=0) == ([], [(0, "Jumlah harus lebih dari 0")])
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    monkeypatch.setattr(db, "DB_NAME", path)
+    migrate(path)
+    with get_connection() as conn:
+        conn.execute("INSERT INTO users (username, password_hash, emergency_rate) VALUES ('alice', 'x', 10)")
+    yield path
+    writer.close_writers()
+    db.close_pools()
+
+
+def _csv(jumlah):
+    lines = ["tanggal,jenis,kategori,jumlah"] + [f"2025-01-{i % 28 + 1:02d},Pendapatan,Keuntungan,{j}" for i, j in enumerate(jumlah)]
+    return "\n".join(lines).encode()
+
+
+def _stored():
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*), COALESCE(SUM(dana_darurat), 0) FROM laporan_keuangan").fetchone()
+
+
+def test_invalid_row_rejects_whole_file(ledger):
+    assert import_transactions("alice", _csv(["1000"] * 30 + ["-5"]), "a.csv", chunk_rows=10)[:2] == (0, 1)
+    assert _stored() == (0, 0)
+
+
+def test_skip_invalid_imports_the_rest(ledger):
+    assert import_transactions("alice", _csv(["1000", "abc", "2.000"]), "a.csv", skip_invalid=True)[:2] == (2, 1)
+    assert _stored() == (2, 300)
+
+
+def test_skip_invalid_reports_rows_committed_before_a_failure(ledger, monkeypatch):
+    execute = writer.execute
+    calls = []
+
+    def failing(command, *args, **kwargs):
+        calls.append(command)
+        if len(calls) == 3:
+            raise TimeoutError()
+        return execute(command, *args, **kwargs)
+
+    monkeypatch.setattr(writer, "execute", failing)
+    with pytest.raises(ImportInterrupted) as raised:
+        import_transactions("alice", _csv(["1000"] * 50), "a.csv", skip_invalid=True, chunk_rows=10)
+    assert raised.value.imported == 20
+    assert _stored() == (20, 2000)
@@ -0,0 +1,114 @@
+"""Trigger-maintained tables against a full recompute after random changes.
+
+    python -m pytest -q tests
+
+daily_summary, kategori_stats and balance_snapshots follow laporan_keuangan
+through triggers. Each test applies a random mix of inserts, updates (moving
+rows between users, days, jenis and kategori) and deletes, then checks the
+table against the from-scratch version its module builds.
+"""
+import random
+
+import pytest
+
+from xpense import balance, db, writer
+from xpense.anomaly import rebuild_stats
+from xpense.db import get_connection
+from xpense.migrations import DAILY_SUMMARY_BACKFILL, migrate
+
+USERS = ["alice", "bob"]
+KATEGORI = {"Pendapatan": ["Gaji", "Keuntungan"], "Pengeluaran": ["Listrik", "PDAM", "Bahan Baku"]}
+CHANGES = 600
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    monkeypatch.setattr(db, "DB_NAME", path)
+    migrate(path)
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, 'x')", [(u,) for u in USERS])
+    yield path
+    writer.close_writers()
+    db.close_pools()
+
+
+def _row(rng):
+    jenis = rng.choice(list(KATEGORI))
+    tanggal = f"{rng.randint(2023, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    jumlah = rng.choice([rng.randint(1_000, 500_000), rng.randint(1_000_000, 20_000_000)])
+    dana_darurat = jumlah * 10 // 100 if jenis == "Pendapatan" else 0
+    return rng.choice(USERS), tanggal, rng.choice(KATEGORI[jenis]), jenis, jumlah, dana_darurat
+
+
+def _random_changes(rng, count=CHANGES):
+    with get_connection() as conn:
+        for _ in range(count):
+            ids = [row[0] for row in conn.execute("SELECT id FROM laporan_keuangan")]
+            action = rng.random()
+            if not ids or action < 0.5:
+                conn.execute("""
+                    INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan)
+                    VALUES (?, ?, ?, ?, ?, ?, '')
+                """, _row(rng))
+            elif action < 0.8:
+                conn.execute("""
+                    UPDATE laporan_keuangan SET username = ?, tanggal = ?, kategori = ?, jenis = ?, jumlah = ?,
+                                                dana_darurat = ?
+                    WHERE id = ?
+                """, (*_row(rng), rng.choice(ids)))
+            else:
+                conn.execute("DELETE FROM laporan_keuangan WHERE id = ?", (rng.choice(ids),))
+
+
+def _table(conn, sql):
+    return sorted(conn.execute(sql).fetchall())
+
+
+def test_daily_summary_matches_backfill(ledger):
+    _random_changes(random.Random(1))
+    with get_connection() as conn:
+        kept = _table(conn, "SELECT * FROM daily_summary")
+        conn.execute("DELETE FROM daily_summary")
+        conn.execute(DAILY_SUMMARY_BACKFILL.format(where=""))
+        rebuilt = _table(conn, "SELECT * FROM daily_summary")
+        conn.rollback()
+    assert kept == rebuilt
+
+
+def test_kategori_stats_match_rebuild(ledger):
+    _random_changes(random.Random(2))
+    with get_connection() as conn:
+        kept = _table(conn, "SELECT username, kategori, n, mean, m2 FROM kategori_stats")
+        rebuild_stats(conn)
+        rebuilt = _table(conn, "SELECT username, kategori, n, mean, m2 FROM kategori_stats")
+        conn.rollback()
+    assert [row[:3] for row in kept] == [row[:3] for row in rebuilt]
+    for (*_, mean, m2), (*_, rebuilt_mean, rebuilt_m2) in zip(kept, rebuilt):
+        assert mean == pytest.approx(rebuilt_mean, rel=1e-9)
+        assert m2 == pytest.approx(rebuilt_m2, rel=1e-6)
+
+
+def test_balance_snapshots_match_full_recompute(ledger):
+    rng = random.Random(3)
+    _random_changes(rng, CHANGES // 2)
+    for _ in range(CHANGES // 4):
+        # Snapshots taken between changes are what the triggers must drop;
+        # few changes per round, or one change's wide delete hides another's.
+        _random_changes(rng, 2)
+        for username in USERS:
+            balance.refresh_snapshots(username, until="2026-01")
+    with get_connection() as conn:
+        kept = _table(conn, "SELECT * FROM balance_snapshots")
+        conn.execute("DELETE FROM balance_snapshots")
+    for username in USERS:
+        balance.refresh_snapshots(username, until="2026-01")
+    with get_connection() as conn:
+        assert kept == _table(conn, "SELECT * FROM balance_snapshots")
+        for username in USERS:
+            totals = conn.execute("""
+                SELECT COALESCE(SUM(CASE WHEN jenis = 'Pendapatan' THEN jumlah ELSE -jumlah END), 0),
+                       COALESCE(SUM(dana_darurat), 0)
+                FROM laporan_keuangan WHERE username = ?
+            """, (username,)).fetchone()
+            assert balance.current_balance(username) == totals
@@ -0,0 +1,145 @@
+"""Cross-user statistics for operators.
+
+    python -m xpense.admin                  # last 30 days
+    python -m xpense.admin --hari 365 --top 20
+    python -m xpense.admin --hari 0         # whole history
+
+Everything is aggregated in SQL from the daily_summary rollup; date ranges
+use idx_daily_summary_tanggal, so no user's ledger is ever loaded into
+memory. Results are cached for CACHE_TTL seconds per process.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.migrations import migrate
+
+CACHE_TTL = float(os.environ.get("XPENSE_ADMIN_CACHE_TTL", "60"))
+DEFAULT_DAYS = 30
+TOP_ACCOUNTS = 10
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cached(name, compute, *args):
+    key = (db.DB_NAME, name, args)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+    value = compute(*args)
+    with _cache_lock:
+        _cache[key] = (now + CACHE_TTL, value)
+    return value
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def period(days=DEFAULT_DAYS, until=None):
+    # (dari, sampai) as ISO dates for the last `days` days up to `until`
+    # (default today); days=0 means the whole history.
+    until = until or date.today()
+    return ((until - timedelta(days=days - 1)).isoformat() if days else "", until.isoformat())
+
+
+def _rows(sql, params=()):
+    with get_connection() as conn:
+        cursor = conn.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _overview(dari, sampai):
+    row = _rows("""
+        SELECT COUNT(DISTINCT username) AS user_aktif,
+               COALESCE(SUM(transaksi), 0) AS transaksi,
+               COALESCE(SUM(CASE WHEN jenis = 'Pendapatan' THEN jumlah END), 0) AS pendapatan,
+               COALESCE(SUM(CASE WHEN jenis = 'Pengeluaran' THEN jumlah END), 0) AS pengeluaran
+        FROM daily_summary WHERE tanggal BETWEEN ? AND ?
+    """, (dari, sampai))[0]
+    with get_connection() as conn:
+        row["user_terdaftar"] = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    return row
+
+
+def overview(dari, sampai):
+    return _cached("overview", _overview, dari, sampai)
+
+
+def daily_volume(dari, sampai):
+    return _cached("daily_volume", _rows, """
+        SELECT tanggal,
+               COUNT(DISTINCT username) AS user_aktif,
+               SUM(transaksi) AS transaksi,
+               SUM(CASE WHEN jenis = 'Pendapatan' THEN jumlah ELSE 0 END) AS pendapatan,
+               SUM(CASE WHEN jenis = 'Pengeluaran' THEN jumlah ELSE 0 END) AS pengeluaran
+        FROM daily_summary WHERE tanggal BETWEEN ? AND ?
+        GROUP BY tanggal ORDER BY tanggal
+    """, (dari, sampai))
+
+
+def kategori_totals(dari, sampai):
+    return _cached("kategori_totals", _rows, """
+        SELECT jenis, kategori, SUM(jumlah) AS jumlah, SUM(transaksi) AS transaksi,
+               COUNT(DISTINCT username) AS user
+        FROM daily_summary WHERE tanggal BETWEEN ? AND ?
+        GROUP BY jenis, kategori ORDER BY jenis, jumlah DESC
+    """, (dari, sampai))
+
+
+def top_accounts(dari, sampai, limit=TOP_ACCOUNTS):
+    # Ranked by transaction count, the load an account puts on the app.
+    return _cached("top_accounts", _rows, """
+        SELECT username, SUM(transaksi) AS transaksi,
+               SUM(CASE WHEN jenis = 'Pendapatan' THEN jumlah ELSE 0 END) AS pendapatan,
+               SUM(CASE WHEN jenis = 'Pengeluaran' THEN jumlah ELSE 0 END) AS pengeluaran,
+               MAX(tanggal) AS terakhir
+        FROM daily_summary WHERE tanggal BETWEEN ? AND ?
+        GROUP BY username ORDER BY transaksi DESC, username LIMIT ?
+    """, (dari, sampai, limit))
+
+
+def _print_table(title, rows):
+    print(f"\n{title}")
+    if not rows:
+        print("  (kosong)")
+        return
+    columns = list(rows[0])
+    cells = [[f"{row[c]:,}" if isinstance(row[c], int) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(line[i]) for line in cells)) for i, c in enumerate(columns)]
+    print("  " + "  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for line in cells:
+        print("  " + "  ".join(cell.rjust(w) for cell, w in zip(line, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hari", type=int, default=DEFAULT_DAYS, help="panjang periode dalam hari, 0 untuk semua")
+    parser.add_argument("--sampai", type=date.fromisoformat, help="akhir periode (YYYY-MM-DD), default hari ini")
+    parser.add_argument("--top", type=int, default=TOP_ACCOUNTS, help="jumlah akun terbesar yang ditampilkan")
+    parser.add_argument("--harian", action="store_true", help="tampilkan juga volume per hari")
+    parser.add_argument("--db", default=db.DB_NAME)
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    migrate()
+    dari, sampai = period(args.hari, args.sampai)
+    print(f"Periode {dari or 'awal'} s.d. {sampai}")
+    _print_table("Ringkasan", [overview(dari, sampai)])
+    if args.harian:
+        _print_table("Volume per hari", daily_volume(dari, sampai))
+    _print_table("Total per kategori", kategori_totals(dari, sampai))
+    _print_table(f"{args.top} akun terbesar", top_accounts(dari, sampai, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Rebuild the per-kategori amount statistics behind anomaly warnings.
+
+    python -m xpense.anomaly               # every user
+    python -m xpense.anomaly --user alice  # one user
+
+kategori_stats normally follows every insert, edit and delete through
+triggers; this rebuilds it from laporan_keuangan in one chunked pass, e.g.
+after editing the database by hand.
+"""
+import argparse
+import math
+import os
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.migrations import migrate
+
+# An amount is unusual when it lies more than Z_THRESHOLD standard deviations
+# above the mean of the user's earlier amounts in the same kategori.
+Z_THRESHOLD = float(os.environ.get("XPENSE_ANOMALY_Z", "3"))
+MIN_HISTORY = 8  # fewer rows say too little about the usual spread
+CHUNK_ROWS = 200_000
+FLAGGED_LIMIT = 20
+
+
+def _std(stats):
+    # Sample standard deviation of a kategori_stats (n, mean, m2) row, or
+    # None when the history cannot tell what is usual.
+    if stats is None or stats[0] < MIN_HISTORY or stats[2] <= 0:
+        return None
+    return math.sqrt(stats[2] / (stats[0] - 1))
+
+
+def zscore(stats, jumlah):
+    std = _std(stats)
+    return None if std is None else (jumlah - stats[1]) / std
+
+
+def _stats(conn, username):
+    rows = conn.execute("SELECT kategori, n, mean, m2 FROM kategori_stats WHERE username = ?", (username,))
+    return {kategori: (n, mean, m2) for kategori, n, mean, m2 in rows}
+
+
+def check(conn, username, kategori, jumlah):
+    # Called by ledger.add_transaction before its insert, on the writer
+    # connection. Returns (z, mean) for an unusual amount, else None.
+    stats = conn.execute("""
+        SELECT n, mean, m2 FROM kategori_stats WHERE username = ? AND kategori = ?
+    """, (username, kategori)).fetchone()
+    z = zscore(stats, jumlah)
+    if z is None or z < Z_THRESHOLD:
+        return None
+    return z, stats[1]
+
+
+def flagged(username, limit=FLAGGED_LIMIT, **filters):
+    # Rows whose jumlah is unusual against the kategori's current statistics,
+    # highest z first. Each kategori is one range scan on
+    # idx_laporan_username_kategori_jumlah from its threshold upwards.
+    from xpense.queries import where_clause
+
+    where, params = where_clause(username, **filters)
+    rows = []
+    with get_connection() as conn:
+        for kategori, stats in _stats(conn, username).items():
+            std = _std(stats)
+            if std is None:
+                continue
+            mean = stats[1]
+            threshold = mean + Z_THRESHOLD * std
+            cursor = conn.execute(f"""
+                SELECT id, tanggal, kategori, jenis, jumlah, keterangan FROM laporan_keuangan
+                WHERE {where} AND kategori = ? AND jumlah >= ?
+                ORDER BY jumlah DESC LIMIT ?
+            """, params + [kategori, threshold, limit])
+            columns = [column[0] for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                row["rata_rata"] = mean
+                row["z"] = zscore(stats, row["jumlah"])
+                rows.append(row)
+    rows.sort(key=lambda row: row["z"], reverse=True)
+    return rows[:limit]
+
+
+def rebuild_stats(conn, username=None):
+    # One pass over the ledger in chunks: per chunk the (n, mean, m2) of each
+    # (username, kategori) comes from a pandas groupby, and chunks are merged
+    # with Chan et al.'s pairwise update, all as vectorized column math.
+    import pandas as pd
+
+    where, params = ("", ()) if username is None else ("WHERE username = ?", (username,))
+    total = None
+    for chunk in pd.read_sql_query(f"SELECT username, kategori, jumlah FROM laporan_keuangan {where}", conn,
+                                   params=params, chunksize=CHUNK_ROWS):
+        grouped = chunk.groupby(["username", "kategori"])["jumlah"]
+        part = pd.DataFrame({"n": grouped.count(), "mean": grouped.mean()})
+        part["m2"] = grouped.var(ddof=0) * part["n"]
+        if total is None:
+            total = part
+            continue
+        total, part = total.align(part, fill_value=0)
+        n = total["n"] + part["n"]
+        delta = part["mean"] - total["mean"]
+        total = pd.DataFrame({
+            "n": n,
+            "mean": total["mean"] + delta * part["n"] / n,
+            "m2": total["m2"] + part["m2"] + delta ** 2 * total["n"] * part["n"] / n,
+        })
+    conn.execute(f"DELETE FROM kategori_stats {where}", params)
+    if total is None:
+        return 0
+    conn.executemany(
+        "INSERT INTO kategori_stats (username, kategori, n, mean, m2) VALUES (?, ?, ?, ?, ?)",
+        [(u, k, int(n), float(mean), float(m2)) for (u, k), n, mean, m2 in
+         zip(total.index, total["n"], total["mean"], total["m2"])],
+    )
+    return len(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", help="hanya bangun ulang statistik untuk user ini")
+    parser.add_argument("--db", default=db.DB_NAME)
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    migrate()
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = rebuild_stats(conn, args.user)
+    print(f"kategori_stats dibangun ulang: {rows:,} baris.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+from xpense import writer
+from xpense.db import get_connection
+
+# Running cash balance (income minus expenses) and accumulated dana_darurat.
+# Every closed month a user has transactions in gets a row in
+# balance_snapshots holding the totals at its end, so a query only sums the
+# rows after the nearest snapshot, with window functions for the running
+# part. Ledger triggers drop a user's snapshots from the month of any change
+# onwards; the next read rebuilds them through the writer.
+
+_END = "9999"  # sorts after every ISO date
+
+
+def _current_month():
+    return date.today().isoformat()[:7]
+
+
+def _month_after(bulan):
+    # First day of the month after `bulan` ("YYYY-MM"); "" (no snapshot) is
+    # the start of history.
+    if not bulan:
+        return ""
+    year, month = map(int, bulan.split("-"))
+    return f"{year + month // 12}-{month % 12 + 1:02d}-01"
+
+
+def _snapshot_before(conn, username, bulan):
+    # (bulan, saldo, dana_darurat) of the latest snapshot before `bulan`
+    row = conn.execute("""
+        SELECT bulan, saldo, dana_darurat FROM balance_snapshots
+        WHERE username = ? AND bulan < ? ORDER BY bulan DESC LIMIT 1
+    """, (username, bulan)).fetchone()
+    return row or ("", 0, 0)
+
+
+def _running(conn, username, period, start, end, saldo, dana_darurat):
+    # Rows per day (period="tanggal") or month (period="bulan") in
+    # [start, end), with totals carried on from saldo / dana_darurat.
+    key = "tanggal" if period == "tanggal" else "substr(tanggal, 1, 7)"
+    cursor = conn.execute(f"""
+        SELECT periode, pendapatan, pengeluaran,
+               ? + SUM(pendapatan - pengeluaran) OVER w AS saldo,
+               ? + SUM(dana) OVER w AS dana_darurat
+        FROM (
+            SELECT {key} AS periode,
+                   SUM(CASE WHEN jenis = 'Pendapatan' THEN jumlah ELSE 0 END) AS pendapatan,
+                   SUM(CASE WHEN jenis = 'Pengeluaran' THEN jumlah ELSE 0 END) AS pengeluaran,
+                   SUM(COALESCE(dana_darurat, 0)) AS dana
+            FROM laporan_keuangan
+            WHERE username = ? AND tanggal >= ? AND tanggal < ?
+            GROUP BY periode
+        )
+        WINDOW w AS (ORDER BY periode)
+        ORDER BY periode
+    """, (saldo, dana_darurat, username, start, end))
+    return [
+        {period: periode, "pendapatan": pendapatan, "pengeluaran": pengeluaran, "saldo": saldo, "dana_darurat": dana}
+        for periode, pendapatan, pengeluaran, saldo, dana in cursor.fetchall()
+    ]
+
+
+def _build_snapshots(conn, username, until):
+    # Runs on the writer thread, so it sees every committed change.
+    bulan, saldo, dana_darurat = _snapshot_before(conn, username, until)
+    rows = _running(conn, username, "bulan", _month_after(bulan), f"{until}-01", saldo, dana_darurat)
+    conn.executemany(
+        "INSERT OR REPLACE INTO balance_snapshots (username, bulan, saldo, dana_darurat) VALUES (?, ?, ?, ?)",
+        [(username, row["bulan"], row["saldo"], row["dana_darurat"]) for row in rows],
+    )
+    return len(rows)
+
+
+def refresh_snapshots(username, until=None):
+    # Snapshots every month before `until` ("YYYY-MM", default the current
+    # month) that has transactions and none yet. The current month stays open.
+    until = until or _current_month()
+    with get_connection() as conn:
+        bulan, _, _ = _snapshot_before(conn, username, until)
+        stale = conn.execute("""
+            SELECT 1 FROM laporan_keuangan WHERE username = ? AND tanggal >= ? AND tanggal < ? LIMIT 1
+        """, (username, _month_after(bulan), f"{until}-01")).fetchone()
+    if stale is None:
+        return 0
+    return writer.execute(lambda conn: _build_snapshots(conn, username, until))
+
+
+def current_balance(username):
+    """Returns (saldo, dana_darurat) over the user's whole history."""
+    refresh_snapshots(username)
+    with get_connection() as conn:
+        bulan, saldo, dana_darurat = _snapshot_before(conn, username, _END)
+        rows = _running(conn, username, "bulan", _month_after(bulan), _END, saldo, dana_darurat)
+    if rows:
+        return rows[-1]["saldo"], rows[-1]["dana_darurat"]
+    return saldo, dana_darurat
+
+
+def monthly_balance(username):
+    # Month-end saldo and dana_darurat for every month with transactions;
+    # closed months come straight from the snapshots.
+    refresh_snapshots(username)
+    with get_connection() as conn:
+        snapshots = conn.execute("""
+            SELECT bulan, saldo, dana_darurat FROM balance_snapshots WHERE username = ? ORDER BY bulan
+        """, (username,)).fetchall()
+        bulan, saldo, dana_darurat = snapshots[-1] if snapshots else ("", 0, 0)
+        rows = _running(conn, username, "bulan", _month_after(bulan), _END, saldo, dana_darurat)
+    return [{"bulan": b, "saldo": s, "dana_darurat": d} for b, s, d in snapshots] + [
+        {"bulan": row["bulan"], "saldo": row["saldo"], "dana_darurat": row["dana_darurat"]} for row in rows
+    ]
+
+
+def running_balance(username, dari=None, sampai=None):
+    # Daily rows (tanggal, pendapatan, pengeluaran, saldo, dana_darurat) for
+    # days with transactions between dari and sampai (dates, inclusive).
+    # Summing starts at the last snapshot before dari's month.
+    refresh_snapshots(username)
+    start = dari.isoformat() if dari else ""
+    end = (sampai + timedelta(days=1)).isoformat() if sampai else _END
+    with get_connection() as conn:
+        bulan, saldo, dana_darurat = _snapshot_before(conn, username, start[:7])
+        rows = _running(conn, username, "tanggal", _month_after(bulan), end, saldo, dana_darurat)
+    return [row for row in rows if row["tanggal"] >= start]
@@ -0,0 +1,130 @@
+"""Precompute the dashboard forecasts for every user.
+
+    python -m xpense.batch_forecast --periods 30 --workers 4
+
+Builds the Pendapatan, Pengeluaran and Keuntungan series exactly like the
+dashboard does without filters, fits them in parallel worker processes and
+stores the forecast and its insights in forecast_results.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.engines import ENGINES
+from xpense.forecast_pool import warm_up_worker
+from xpense.forecasting import FORECAST_TYPES, build_series, generate_forecasting_insights, run_forecast
+from xpense.migrations import migrate
+from xpense.queries import daily_summary
+
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+# Precomputing pays off for the slow engine; "Cepat" runs live in milliseconds.
+ENGINE = "Prophet"
+
+
+def _fit_job(username, forecast_type, series, periods, version):
+    model, forecast = run_forecast(username, forecast_type, series, periods, version=version, engine=ENGINE)
+    forecast = forecast[FORECAST_COLUMNS]
+    insights = generate_forecasting_insights(forecast, periods, FORECAST_TYPES[forecast_type])
+    return ENGINES[ENGINE].to_json(model), forecast.to_json(orient="split", date_format="iso"), json.dumps(insights)
+
+
+def _user_jobs(usernames, periods):
+    with get_connection() as conn:
+        if usernames:
+            marks = ", ".join("?" for _ in usernames)
+            rows = conn.execute(f"SELECT username, data_version FROM users WHERE username IN ({marks})", usernames).fetchall()
+        else:
+            rows = conn.execute("SELECT username, data_version FROM users ORDER BY username").fetchall()
+    for username, version in rows:
+        daily = daily_summary(username)
+        if daily.empty:
+            continue
+        for forecast_type in FORECAST_TYPES:
+            series = build_series(daily, forecast_type)
+            if len(series) >= 2:
+                yield username, forecast_type, series, periods, version
+
+
+def save_result(username, forecast_type, periods, version, model_json, forecast_json, insights_json):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO forecast_results
+                (username, forecast_type, periods, data_version, model_json, forecast_json, insights_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (username, forecast_type, periods, version, model_json, forecast_json, insights_json,
+              datetime.now().isoformat(timespec="seconds")))
+
+
+def load_precomputed(username, forecast_type, periods, version):
+    # Only results computed from the user's current data (same data_version) count.
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT periods, model_json, forecast_json, insights_json, created_at FROM forecast_results
+            WHERE username = ? AND forecast_type = ? AND data_version = ?
+        """, (username, forecast_type, version)).fetchone()
+    if row is None:
+        return None
+    stored_periods, model_json, forecast_json, insights_json, created_at = row
+    forecast = pd.read_json(io.StringIO(forecast_json), orient="split")
+    forecast["ds"] = pd.to_datetime(forecast["ds"])
+    if periods == stored_periods:
+        insights = json.loads(insights_json)
+    elif periods < stored_periods:
+        forecast = forecast.iloc[:len(forecast) - (stored_periods - periods)]
+        insights = generate_forecasting_insights(forecast, periods, FORECAST_TYPES[forecast_type])
+    else:
+        # Longer horizon than precomputed: predict from the stored model, no refit needed.
+        engine = ENGINES[ENGINE]
+        forecast = engine.predict(engine.from_json(model_json), periods)[FORECAST_COLUMNS]
+        insights = generate_forecasting_insights(forecast, periods, FORECAST_TYPES[forecast_type])
+    return {
+        "forecast_type": forecast_type,
+        "periods": periods,
+        "engine": ENGINE,
+        "model_json": model_json,
+        "forecast": forecast,
+        "insights": insights,
+        "created_at": created_at,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--periods", type=int, default=30, help="jumlah hari ke depan (default 30)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--user", action="append", help="hanya user ini (boleh diulang)")
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    migrate()
+    started = time.perf_counter()
+    done = failed = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_up_worker,
+    ) as executor:
+        futures = {executor.submit(_fit_job, *job): job for job in _user_jobs(args.user, args.periods)}
+        for future in as_completed(futures):
+            username, forecast_type, _, periods, version = futures[future]
+            try:
+                save_result(username, forecast_type, periods, version, *future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"Gagal: {username} / {forecast_type}: {e}")
+    print(f"{done} forecast disimpan, {failed} gagal, {time.perf_counter() - started:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
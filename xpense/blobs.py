@@ -0,0 +1,55 @@
+import hashlib
+
+from xpense import writer
+from xpense.db import get_connection
+from xpense.images import InvalidImageError, make_thumbnail
+
+
+def blob_ref(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def put_blob(conn, data, thumb=None):
+    # Content addressed: identical uploads share one row.
+    ref = blob_ref(data)
+    conn.execute("INSERT OR IGNORE INTO blobs (hash, data, size, thumb) VALUES (?, ?, ?, ?)", (ref, data, len(data), thumb))
+    return ref
+
+
+def get_blob(ref, path=None):
+    if not ref:
+        return None
+    with get_connection(path) as conn:
+        row = conn.execute("SELECT data FROM blobs WHERE hash = ?", (ref,)).fetchone()
+    return row[0] if row else None
+
+
+def get_thumbnail(ref, path=None):
+    # Blobs stored before thumbnails existed get theirs on first view.
+    if not ref:
+        return None
+    with get_connection(path) as conn:
+        row = conn.execute("SELECT thumb FROM blobs WHERE hash = ?", (ref,)).fetchone()
+    if row is None:
+        return None
+    if row[0] is not None:
+        return row[0]
+    data = get_blob(ref, path)
+    try:
+        thumb = make_thumbnail(data)
+    except InvalidImageError:
+        return data
+    writer.execute(lambda conn: conn.execute("UPDATE blobs SET thumb = ? WHERE hash = ?", (thumb, ref)), path)
+    return thumb
+
+
+def release_blob(conn, ref):
+    # Drop the blob once neither a transaction nor a profile points at it.
+    if not ref:
+        return
+    conn.execute("""
+        DELETE FROM blobs
+        WHERE hash = ?
+          AND NOT EXISTS (SELECT 1 FROM laporan_keuangan WHERE bukti_ref = ?)
+          AND NOT EXISTS (SELECT 1 FROM users WHERE profile_ref = ?)
+    """, (ref, ref, ref))
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from xpense import db
+
+# Dashboard charts are built here as plotly graph objects. Long ranges are
+# aggregated to weeks or months, and any trace that still has more than
+# MAX_POINTS points is downsampled with LTTB (largest triangle three buckets),
+# which keeps peaks and dips visible while the browser draws a few hundred
+# points instead of thousands.
+MAX_POINTS = int(os.environ.get("XPENSE_CHART_POINTS", "500"))
+MARKER_LIMIT = 120  # markers only while they can still be told apart
+FIGURE_CACHE_ENTRIES = int(os.environ.get("XPENSE_FIGURE_CACHE_ENTRIES", "128"))
+
+GRANULARITIES = ["Harian", "Mingguan", "Bulanan"]
+_PERIODS = {"Mingguan": "W", "Bulanan": "M"}
+COLORS = {"pendapatan": "#4CAF50", "pengeluaran": "#F44336"}
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def auto_granularity(daily):
+    span = (daily["tanggal"].max() - daily["tanggal"].min()).days
+    if span <= 92:
+        return "Harian"
+    if span <= 2 * 365:
+        return "Mingguan"
+    return "Bulanan"
+
+
+def aggregate(daily, granularity):
+    # Sums per week (starting Monday) or calendar month; periods without any
+    # transaction are left out, just like days without one.
+    if granularity == "Harian":
+        return daily
+    start = daily["tanggal"].dt.to_period(_PERIODS[granularity]).dt.start_time
+    return daily.drop(columns="tanggal").groupby(start).sum().rename_axis("tanggal").reset_index()
+
+
+def lttb(x, y, threshold):
+    # Indices of the points LTTB keeps; all of them when there are few enough.
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # First and last points are always kept; the rest is split into
+    # threshold - 2 buckets and each bucket keeps the point forming the
+    # largest triangle with the previous pick and the next bucket's average.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _x(dates):
+    return pd.to_datetime(dates).astype("int64").to_numpy()
+
+
+def trend_figure(daily, columns, granularity):
+    data = aggregate(daily, granularity)
+    fig = go.Figure()
+    for column in columns:
+        keep = lttb(_x(data["tanggal"]), data[column], MAX_POINTS)
+        fig.add_trace(go.Scatter(
+            x=data["tanggal"].iloc[keep], y=data[column].iloc[keep], name=column,
+            mode="lines+markers" if len(keep) <= MARKER_LIMIT else "lines",
+            line={"color": COLORS.get(column)},
+        ))
+    fig.update_layout(title=f"Tren Keuangan {granularity}", xaxis_title="Tanggal", yaxis_title="Jumlah")
+    return fig
+
+
+def balance_figure(rows, period):
+    # Running saldo and accumulated dana_darurat (xpense.balance rows), per
+    # day (period="tanggal") or month end (period="bulan").
+    frame = pd.DataFrame(rows)
+    frame[period] = pd.to_datetime(frame[period])
+    fig = go.Figure()
+    for column, name, color in (("saldo", "Saldo", "#2196F3"), ("dana_darurat", "Dana Darurat", "#FF9800")):
+        keep = lttb(_x(frame[period]), frame[column], MAX_POINTS)
+        fig.add_trace(go.Scatter(x=frame[period].iloc[keep], y=frame[column].iloc[keep], name=name, line={"color": color},
+                                 mode="lines+markers" if len(keep) <= MARKER_LIMIT else "lines"))
+    fig.update_layout(xaxis_title="Tanggal", yaxis_title="Jumlah")
+    return fig
+
+
+def forecast_figure(history_ds, history_y, forecast):
+    # Prediction line with its uncertainty band and the observed points.
+    forecast = forecast.iloc[lttb(_x(forecast["ds"]), forecast["yhat"], MAX_POINTS)]
+    history_ds = pd.to_datetime(pd.Series(history_ds)).reset_index(drop=True)
+    history_y = pd.Series(history_y).reset_index(drop=True)
+    history = lttb(_x(history_ds), history_y, MAX_POINTS)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=forecast["ds"], y=forecast["yhat_upper"], line={"width": 0}, hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(x=forecast["ds"], y=forecast["yhat_lower"], line={"width": 0}, fill="tonexty",
+                             fillcolor="rgba(0, 114, 178, 0.2)", name="Rentang ketidakpastian"))
+    fig.add_trace(go.Scatter(x=forecast["ds"], y=forecast["yhat"], line={"color": "#0072B2"}, name="Prediksi"))
+    fig.add_trace(go.Scatter(x=history_ds.iloc[history], y=history_y.iloc[history], mode="markers",
+                             marker={"color": "black", "size": 4}, name="Data aktual"))
+    fig.update_layout(xaxis_title="Tanggal", yaxis_title="Jumlah")
+    return fig
+
+
+def cached_figure(key, build):
+    # Built figures by filter state. Keys must include the user's
+    # data_version so a ledger change never shows an old chart. The figure is
+    # shared between sessions and must not be modified after it is returned.
+    key = (db.DB_NAME, *key)
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+    fig = build()
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_ENTRIES:
+            _figures.popitem(last=False)
+    return fig
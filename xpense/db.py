@@ -0,0 +1,141 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from xpense import metrics
+
+DB_NAME = os.environ.get("XPENSE_DB", "users.db")
+POOL_SIZE = int(os.environ.get("XPENSE_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = int(os.environ.get("XPENSE_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Applied once to every new connection in the pool
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, fsync only at checkpoints
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class TimedCursor(sqlite3.Cursor):
+    # execute() steps to the first row, so reads are timed up to the first
+    # result; later fetches are not. Good enough to find the slow statement.
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe("sql_statement_seconds", time.perf_counter() - started, statement=metrics.statement_label(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe("sql_statement_seconds", time.perf_counter() - started, statement=metrics.statement_label(sql))
+
+
+class TimedConnection(sqlite3.Connection):
+    # Connection.execute() does not go through cursor(), so route it there
+    # explicitly; pandas.read_sql_query uses cursor() directly.
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(path, **kwargs):
+    # Streamlit runs every rerun on a different thread, so connections may
+    # move between threads as long as only one borrower holds them.
+    factory = TimedConnection if metrics.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=factory, **kwargs)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return connect(self.path)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if not can_create:
+            return self._idle.get()
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    path = path or DB_NAME
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+@contextmanager
+def get_connection(path=None):
+    # Borrow a pooled connection; commit when the block finishes normally,
+    # roll back on an exception, then hand the connection back to the pool.
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.release(conn)
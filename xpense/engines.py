@@ -0,0 +1,151 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Forecasting backends behind the dashboard's "Mesin Forecasting" picker. Every
+# engine returns the same frame Prophet does (ds over history + horizon, with
+# yhat / yhat_lower / yhat_upper), so generate_forecasting_insights and the
+# charts do not care which one ran.
+
+INTERVAL_Z = 1.2815515655446004  # 80% interval, Prophet's default interval_width
+
+
+class ProphetEngine:
+    name = "Prophet"
+    cache_fits = True  # fits take seconds; forecasting.run_forecast keeps them on disk
+
+    def fit(self, series, seasonalities, timeout=None):
+        from prophet import Prophet
+
+        model = Prophet()
+        for name, period, fourier_order in seasonalities:
+            model.add_seasonality(name=name, period=period, fourier_order=fourier_order)
+        # timeout is handed to cmdstanpy's optimizer, which kills the Stan process
+        model.fit(series, timeout=timeout)
+        return model
+
+    def predict(self, model, periods):
+        return model.predict(model.make_future_dataframe(periods=periods))
+
+    def to_json(self, model):
+        from prophet.serialize import model_to_json
+
+        return model_to_json(model)
+
+    def from_json(self, text):
+        from prophet.serialize import model_from_json
+
+        return model_from_json(text)
+
+    def plot(self, model, forecast):
+        from xpense.charts import forecast_figure
+
+        return forecast_figure(model.history["ds"], model.history["y"], forecast)
+
+
+class HoltWintersEngine:
+    # Additive Holt-Winters with damped trend and weekly seasonality (ETS(A,Ad,A)).
+    # The smoothing parameters are picked by grid search, running the recursion
+    # for every grid point at once as NumPy vectors, so a fit over a few years of
+    # daily data takes milliseconds. Yearly seasonality is not modelled.
+    name = "Cepat"
+    cache_fits = False
+
+    ALPHAS = np.array([0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+    BETAS = np.array([0.0, 0.005, 0.02, 0.05, 0.1])
+    GAMMAS = np.array([0.0, 0.02, 0.05, 0.1, 0.2, 0.4])
+    PHI = 0.98
+
+    def fit(self, series, seasonalities, timeout=None):
+        # Days without transactions are interpolated, the same way Prophet only
+        # sees the observed days.
+        daily = series.set_index("ds")["y"].astype(float).resample("D").mean().interpolate()
+        y = daily.to_numpy()
+        m = 7 if any(name == "weekly" for name, _, _ in seasonalities) and len(y) >= 14 else 1
+
+        alpha, beta, gamma = (grid.ravel() for grid in np.meshgrid(self.ALPHAS, self.BETAS, self.GAMMAS, indexing="ij"))
+        valid = (beta <= alpha) & (gamma <= 1 - alpha)
+        if m == 1:
+            valid &= gamma == 0
+        alpha, beta, gamma = alpha[valid], beta[valid], gamma[valid]
+
+        fitted, level, trend, season, sse = self._smooth(y, m, alpha, beta, gamma)
+        best = int(np.argmin(sse))
+        residuals = y - fitted[:, best]
+        sigma = float(np.sqrt(np.mean(residuals ** 2))) if len(y) > 1 else 0.0
+
+        # Map the one-step-ahead fits back onto the originally observed days.
+        positions = daily.index.get_indexer(series["ds"])
+        return {
+            "alpha": float(alpha[best]),
+            "beta": float(beta[best]),
+            "gamma": float(gamma[best]),
+            "phi": self.PHI,
+            "m": m,
+            "n": len(y),
+            "level": float(level[best]),
+            "trend": float(trend[best]),
+            "season": season[best].tolist(),
+            "sigma": sigma,
+            "last_ds": daily.index[-1].isoformat(),
+            "history_ds": [ds.isoformat() for ds in series["ds"]],
+            "history_y": series["y"].astype(float).tolist(),
+            "history_yhat": fitted[positions, best].tolist(),
+        }
+
+    def _smooth(self, y, m, alpha, beta, gamma):
+        k = len(alpha)
+        first = y[:m]
+        level = np.full(k, first.mean())
+        second = y[m:2 * m]
+        trend = np.full(k, (second.mean() - first.mean()) / m if len(second) == m else 0.0)
+        season = np.tile(first - first.mean() if m > 1 else np.zeros(1), (k, 1))
+        fitted = np.empty((len(y), k))
+        sse = np.zeros(k)
+        for t, value in enumerate(y):
+            slot = t % m
+            prediction = level + self.PHI * trend + season[:, slot]
+            error = value - prediction
+            fitted[t] = prediction
+            sse += error ** 2
+            level = level + self.PHI * trend + alpha * error
+            trend = self.PHI * trend + beta * error
+            season[:, slot] += gamma * error
+        return fitted, level, trend, season, sse
+
+    def predict(self, model, periods):
+        h = np.arange(1, periods + 1)
+        phi, m = model["phi"], model["m"]
+        damped = np.cumsum(phi ** h)  # phi + phi^2 + ... + phi^h
+        season = np.asarray(model["season"])[(model["n"] + h - 1) % m]
+        yhat = model["level"] + damped * model["trend"] + season
+
+        # h-step variance for ETS(A,Ad,A): sigma^2 * (1 + sum_{j<h} c_j^2)
+        # with c_j = alpha + beta * phi_j + gamma * [j is a multiple of m]
+        c = model["alpha"] + model["beta"] * damped[:-1] + model["gamma"] * ((h[:-1] % m) == 0)
+        spread = INTERVAL_Z * model["sigma"] * np.sqrt(1 + np.concatenate([[0.0], np.cumsum(c ** 2)]))
+
+        history_yhat = np.asarray(model["history_yhat"])
+        history_spread = INTERVAL_Z * model["sigma"]
+        future_ds = pd.date_range(pd.Timestamp(model["last_ds"]) + pd.Timedelta(days=1), periods=periods, freq="D")
+        return pd.DataFrame({
+            "ds": pd.to_datetime(model["history_ds"]).append(future_ds),
+            "yhat": np.concatenate([history_yhat, yhat]),
+            "yhat_lower": np.concatenate([history_yhat - history_spread, yhat - spread]),
+            "yhat_upper": np.concatenate([history_yhat + history_spread, yhat + spread]),
+        })
+
+    def to_json(self, model):
+        return json.dumps(model)
+
+    def from_json(self, text):
+        return json.loads(text)
+
+    def plot(self, model, forecast):
+        from xpense.charts import forecast_figure
+
+        return forecast_figure(model["history_ds"], model["history_y"], forecast)
+
+
+ENGINES = {engine.name: engine for engine in (HoltWintersEngine(), ProphetEngine())}
@@ -0,0 +1,125 @@
+"""Export a user's transactions to CSV or Parquet.
+
+    python -m xpense.exporter --user alice --output alice.parquet
+    python -m xpense.exporter --user alice --format csv --tahun 2025 > alice.csv
+
+Rows are streamed from laporan_keuangan in chunks and written as they
+arrive, so memory stays flat however long the history is. Images are not
+exported; bukti_ref names the blob instead.
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import date
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.migrations import migrate
+from xpense.queries import where_clause
+
+CHUNK_ROWS = 5_000
+COLUMNS = ["id", "tanggal", "kategori", "jenis", "jumlah", "dana_darurat", "keterangan", "bukti_ref"]
+FORMATS = {"CSV": "csv", "Parquet": "parquet"}
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def iter_chunks(username, chunk_rows=CHUNK_ROWS, **filters):
+    # One read transaction for the whole export: under WAL it sees a stable
+    # snapshot without blocking writers.
+    where, params = where_clause(username, **filters)
+    with get_connection() as conn:
+        cursor = conn.execute(f"""
+            SELECT {", ".join(COLUMNS)} FROM laporan_keuangan
+            WHERE {where}
+            ORDER BY tanggal, id
+        """, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield rows
+
+
+def write_csv(out, username, **filters):
+    # `out` is a binary file; utf-8-sig so Excel detects the encoding.
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+    count = 0
+    for rows in iter_chunks(username, **filters):
+        writer.writerows(rows)
+        count += len(rows)
+    text.flush()
+    text.detach()
+    return count
+
+
+def write_parquet(out, username, **filters):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("tanggal", pa.date32()),
+        ("kategori", pa.string()),
+        ("jenis", pa.string()),
+        ("jumlah", pa.int64()),
+        ("dana_darurat", pa.int64()),
+        ("keterangan", pa.string()),
+        ("bukti_ref", pa.string()),
+    ])
+    count = 0
+    # Each chunk becomes its own row group; nothing else is kept in memory.
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for rows in iter_chunks(username, **filters):
+            columns = dict(zip(COLUMNS, zip(*rows)))
+            columns["tanggal"] = pa.array(columns["tanggal"], pa.string()).cast(pa.date32())
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(rows)
+        if count == 0:
+            writer.write_table(schema.empty_table())
+    return count
+
+
+def export(out, fmt, username, **filters):
+    if fmt == "csv":
+        return write_csv(out, username, **filters)
+    if fmt == "parquet":
+        return write_parquet(out, username, **filters)
+    raise ValueError(f"unknown export format: {fmt}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--format", choices=sorted(FORMATS.values()),
+                        help="default dari ekstensi --output, atau csv")
+    parser.add_argument("--output", default="-", help="file tujuan, '-' untuk stdout (default)")
+    parser.add_argument("--jenis", choices=["Pendapatan", "Pengeluaran"])
+    parser.add_argument("--kategori")
+    parser.add_argument("--tahun", type=int)
+    parser.add_argument("--dari", type=date.fromisoformat, help="tanggal awal (YYYY-MM-DD)")
+    parser.add_argument("--sampai", type=date.fromisoformat, help="tanggal akhir (YYYY-MM-DD)")
+    parser.add_argument("--db", default=db.DB_NAME)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    if fmt == "parquet" and args.output == "-":
+        parser.error("Parquet membutuhkan --output berupa file")
+    filters = {"jenis": args.jenis, "kategori": args.kategori, "tahun": args.tahun}
+    if args.dari or args.sampai:
+        filters["rentang"] = (args.dari or date.min, args.sampai or date.max)
+
+    db.DB_NAME = args.db
+    migrate()
+    if args.output == "-":
+        count = export(sys.stdout.buffer, fmt, args.user, **filters)
+    else:
+        with open(args.output, "wb") as out:
+            count = export(out, fmt, args.user, **filters)
+    print(f"{count:,} transaksi diekspor.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
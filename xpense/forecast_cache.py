@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+# Fitted models, serialized by their engine, kept on disk. File names carry
+# the user's data_version, so an entry is never reused after the ledger
+# changes; stale entries are purged the next time that user stores a model.
+CACHE_DIR = os.environ.get("XPENSE_CACHE_DIR", os.path.join(".cache", "forecast"))
+MAX_ENTRIES = int(os.environ.get("XPENSE_FORECAST_CACHE_ENTRIES", "500"))
+MAX_BYTES = int(os.environ.get("XPENSE_FORECAST_CACHE_MB", "200")) * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def _user_prefix(username):
+    return hashlib.sha256(username.encode()).hexdigest()[:16] + "-"
+
+
+def _path(username, version, key):
+    return os.path.join(CACHE_DIR, f"{_user_prefix(username)}{version}-{key}.json")
+
+
+def cache_key(username, variant, seasonalities, series):
+    digest = hashlib.sha256(json.dumps([username, variant, seasonalities]).encode())
+    digest.update(pd.util.hash_pandas_object(series[["ds", "y"]], index=False).values.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def load(username, version, key):
+    path = _path(username, version, key)
+    try:
+        with open(path) as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # mtime doubles as the LRU clock
+    return text
+
+
+def store(username, version, key, text):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(username, version, key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    with _lock:
+        _purge_stale(username, version)
+        _evict()
+
+
+def _purge_stale(username, version):
+    prefix = _user_prefix(username)
+    current = f"{prefix}{version}-"
+    for name in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+        if name.startswith(prefix) and not name.startswith(current):
+            _remove(os.path.join(CACHE_DIR, name))
+
+
+def _evict():
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".json"):
+            try:
+                stat = os.stat(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and (len(entries) > MAX_ENTRIES or total > MAX_BYTES):
+        _, size, name = entries.pop(0)
+        _remove(os.path.join(CACHE_DIR, name))
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from xpense import metrics
+
+# Prophet fits run in a pool of long-lived worker processes so the Streamlit
+# script thread never blocks on Stan. MAX_WORKERS caps concurrent fits for the
+# whole server and MAX_JOBS_PER_USER keeps one user from filling the queue.
+MAX_WORKERS = int(os.environ.get("XPENSE_FORECAST_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+MAX_JOBS_PER_USER = int(os.environ.get("XPENSE_FORECAST_JOBS_PER_USER", "1"))
+JOB_TIMEOUT = float(os.environ.get("XPENSE_FORECAST_TIMEOUT", "120"))
+# Parent-side backstop; it also covers time spent waiting for a free worker.
+JOB_DEADLINE = JOB_TIMEOUT * 2
+# Finished jobs nobody collected are dropped after this many seconds.
+JOB_RETENTION = 600
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+TIMEOUT = "timeout"
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def warm_up_worker():
+    # Runs once per worker: pays the prophet/cmdstanpy import and Stan model load up front.
+    from prophet import Prophet
+
+    Prophet()
+
+
+def _forecast_job(username, forecast_type, series, periods, version, engine):
+    from xpense.engines import ENGINES
+    from xpense.forecasting import run_forecast
+
+    model, forecast = run_forecast(username, forecast_type, series, periods, version=version, timeout=JOB_TIMEOUT, engine=engine)
+    # Prophet models do not pickle reliably; ship the JSON form back instead.
+    # The worker's timings travel with the result into the app's metrics.
+    return ENGINES[engine].to_json(model), forecast, metrics.drain()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: forking the multi-threaded Streamlit server is not safe
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up_worker,
+        )
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _status(job):
+    if "futures" in job:
+        # A group is finished once every fit is; at the deadline whatever is
+        # still queued is cancelled and reported as timed out.
+        if all(future.done() for future in job["futures"].values()):
+            return DONE
+        if time.monotonic() - job["submitted"] > JOB_DEADLINE:
+            for future in job["futures"].values():
+                future.cancel()
+            return DONE
+        return PENDING
+    future = job["future"]
+    if future.done():
+        if future.cancelled():
+            return TIMEOUT
+        return FAILED if future.exception() is not None else DONE
+    if time.monotonic() - job["submitted"] > JOB_DEADLINE:
+        future.cancel()
+        return TIMEOUT
+    return PENDING
+
+
+def _forget_old_jobs():
+    now = time.monotonic()
+    for job_id, job in list(_jobs.items()):
+        if _status(job) != PENDING and now - job["submitted"] > JOB_RETENTION:
+            del _jobs[job_id]
+
+
+def _submit(*args):
+    try:
+        return _get_executor().submit(_forecast_job, *args)
+    except BrokenProcessPool:
+        _reset_executor()
+        return _get_executor().submit(_forecast_job, *args)
+
+
+def _busy(username):
+    running = sum(1 for job in _jobs.values() if job["username"] == username and _status(job) == PENDING)
+    return running >= MAX_JOBS_PER_USER
+
+
+def submit(username, forecast_type, series, periods, version, engine="Prophet"):
+    # Returns the job id, or None when the user already has MAX_JOBS_PER_USER running.
+    with _lock:
+        _forget_old_jobs()
+        if _busy(username):
+            return None
+        future = _submit(username, forecast_type, series, periods, version, engine)
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {"username": username, "future": future, "submitted": time.monotonic()}
+        return job_id
+
+
+def submit_group(username, series_by_type, periods, version, engine="Prophet"):
+    # Several series fitted side by side on the pool's workers, tracked as
+    # one job (it counts once against MAX_JOBS_PER_USER). Longest series go
+    # first so they do not end up last on an otherwise idle pool.
+    with _lock:
+        _forget_old_jobs()
+        if _busy(username):
+            return None
+        order = sorted(series_by_type, key=lambda forecast_type: len(series_by_type[forecast_type]), reverse=True)
+        futures = {
+            forecast_type: _submit(username, forecast_type, series_by_type[forecast_type], periods, version, engine)
+            for forecast_type in order
+        }
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {"username": username, "futures": futures, "submitted": time.monotonic()}
+        return job_id
+
+
+def poll(job_id):
+    # (status, seconds since submit); unknown ids report as failed.
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return FAILED, 0.0
+        return _status(job), time.monotonic() - job["submitted"]
+
+
+def _outcome(future):
+    # (status, (model_json, forecast) or the error message) of one fit
+    error = future.exception() if future.done() and not future.cancelled() else TimeoutError()
+    if isinstance(error, TimeoutError):
+        return TIMEOUT, f"Forecasting melebihi batas waktu {JOB_TIMEOUT:.0f} detik."
+    if error is not None:
+        if isinstance(error, BrokenProcessPool):
+            with _lock:
+                _reset_executor()
+        return FAILED, str(error)
+    model_json, forecast, observed = future.result()
+    metrics.merge(observed)
+    return DONE, (model_json, forecast)
+
+
+def collect(job_id):
+    # Pops a finished job: (status, (model_json, forecast) or the error message).
+    # For a group the result is {forecast_type: (status, result)} instead.
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return FAILED, "Job forecasting tidak ditemukan."
+        status = _status(job)
+        if status == PENDING:
+            return PENDING, None
+        del _jobs[job_id]
+    if "futures" in job:
+        return DONE, {forecast_type: _outcome(future) for forecast_type, future in job["futures"].items()}
+    if status == TIMEOUT:
+        return TIMEOUT, f"Forecasting melebihi batas waktu {JOB_TIMEOUT:.0f} detik."
+    return _outcome(job["future"])
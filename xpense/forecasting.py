@@ -0,0 +1,184 @@
+import os
+
+import pandas as pd
+
+from xpense import forecast_cache, metrics
+from xpense.engines import ENGINES
+from xpense.ledger import data_version
+
+FORECAST_TYPES = {
+    "Pendapatan": "pendapatan",
+    "Pengeluaran": "pengeluaran",
+    "Keuntungan (Pendapatan - Pengeluaran)": "keuntungan",
+}
+
+# Dashboard mode that forecasts every expense kategori at once
+CATEGORY_FORECAST = "Semua Kategori Pengeluaran"
+# Kategori with fewer days of data than this are not fitted
+MIN_CATEGORY_POINTS = int(os.environ.get("XPENSE_CATEGORY_MIN_POINTS", "10"))
+
+
+def build_series(daily, forecast_type):
+    # daily is the per-day frame from queries.daily_summary
+    if forecast_type == "Pendapatan":
+        series = daily.loc[daily["n_pendapatan"] > 0, ["tanggal", "pendapatan"]]
+    elif forecast_type == "Pengeluaran":
+        series = daily.loc[daily["n_pengeluaran"] > 0, ["tanggal", "pengeluaran"]]
+    else:
+        # Every day with any transaction; the daily summary already fills the missing side with 0
+        series = pd.DataFrame({"tanggal": daily["tanggal"], "jumlah": daily["pendapatan"] - daily["pengeluaran"]})
+    series = series.copy()
+    series.columns = ["ds", "y"]  # Rename columns for Prophet
+    series["ds"] = pd.to_datetime(series["ds"])
+    return series.reset_index(drop=True)
+
+
+def build_category_series(pivot, min_points=MIN_CATEGORY_POINTS):
+    # pivot is queries.kategori_daily; each kategori becomes a (ds, y) series
+    # of the days it occurs on. Returns (series by kategori, points of the
+    # kategori skipped as too sparse).
+    series, skipped = {}, {}
+    for kategori in pivot.columns:
+        column = pivot[kategori].dropna()
+        if len(column) < min_points:
+            skipped[kategori] = len(column)
+            continue
+        series[kategori] = pd.DataFrame({"ds": pd.to_datetime(column.index), "y": column.to_numpy(dtype=float)})
+    return series, skipped
+
+
+def projected_growth(forecast, periods):
+    # Mean predicted value over the horizon against the mean fitted value over
+    # the same number of days just before it; (recent, projected, growth).
+    future = forecast["yhat"].iloc[-periods:].mean()
+    recent = forecast["yhat"].iloc[:-periods].tail(periods).mean()
+    growth = (future - recent) / abs(recent) if recent else None
+    return recent, future, growth
+
+
+def rank_categories(forecasts, periods):
+    # forecasts is {kategori: forecast frame}; one row per kategori with its
+    # projected growth and insights, fastest growing first.
+    rows = []
+    for kategori, forecast in forecasts.items():
+        recent, projected, growth = projected_growth(forecast, periods)
+        rows.append({
+            "kategori": kategori,
+            "recent": recent,
+            "projected": projected,
+            "growth": growth,
+            "insights": generate_forecasting_insights(forecast, periods, f"pengeluaran {kategori}"),
+        })
+    rows.sort(key=lambda row: float("-inf") if row["growth"] is None else row["growth"], reverse=True)
+    return rows
+
+
+def seasonality_config(series):
+    span_days = (series["ds"].max() - series["ds"].min()).days
+    seasonalities = []
+    if span_days >= 365 * 2:  # At least 2 years for yearly
+        seasonalities.append(("yearly", 365.25, 10))
+    if span_days >= 7 * 2:  # At least 2 weeks for weekly
+        seasonalities.append(("weekly", 7, 3))
+    return seasonalities
+
+
+def _fit(engine, series, seasonalities, timeout):
+    metrics.observe("forecast_series_points", len(series), engine=engine.name)
+    with metrics.timer("forecast_fit_seconds", engine=engine.name):
+        return engine.fit(series, seasonalities, timeout=timeout)
+
+
+def _predict(engine, model, periods):
+    with metrics.timer("forecast_predict_seconds", engine=engine.name):
+        return engine.predict(model, periods)
+
+
+def run_forecast(username, forecast_type, series, periods, version=None, timeout=None, engine="Prophet"):
+    engine = ENGINES[engine]
+    seasonalities = seasonality_config(series)
+    if not engine.cache_fits:
+        model = _fit(engine, series, seasonalities, timeout)
+        return model, _predict(engine, model, periods)
+
+    # The horizon is not part of the cache key: moving the slider only re-runs predict.
+    key = forecast_cache.cache_key(username, [engine.name, forecast_type], seasonalities, series)
+    if version is None:
+        version = data_version(username)
+    model = None
+    cached = forecast_cache.load(username, version, key)
+    if cached is not None:
+        try:
+            model = engine.from_json(cached)
+        except ValueError:
+            model = None  # unreadable entry, refit and overwrite it
+    if model is None:
+        model = _fit(engine, series, seasonalities, timeout)
+        forecast_cache.store(username, version, key, engine.to_json(model))
+    return model, _predict(engine, model, periods)
+
+
+def generate_forecasting_insights(df_forecast, periods, data_type):
+    insights = []
+    
+    # Filter forecast to only include future predictions
+    future_forecast = df_forecast.tail(periods)
+
+    if future_forecast.empty:
+        insights.append(f"Tidak ada data *forecast* {data_type} di masa depan untuk dianalisis.")
+        return insights
+
+    # Get the last historical value for comparison (from the part of df_forecast that's not future)
+    # This needs to be robust, ensuring we get the actual last historical data point.
+    # We assume 'ds' is sorted and the last 'periods' rows are the future.
+    # So the last historical point would be just before the future period starts.
+    if len(df_forecast) > periods:
+        last_historical_value = df_forecast['yhat'].iloc[len(df_forecast) - periods - 1]
+    else:
+        # This case implies df_forecast largely consists of future data or very few historical points.
+        # We need a robust way to get the last actual historical data point.
+        # If 'y' column was preserved (which it isn't in 'forecast' output), we could use df_pendapatan['y'].iloc[-1].
+        # For 'forecast' dataframe, we can assume the last non-future point is the one just before the prediction starts.
+        # Or, if only future is available, the first prediction itself might serve as a baseline for trend.
+        # For simplicity and robustnes here, we'll try to find the last historical 'yhat' in df_forecast.
+        # This might not be ideal if df_forecast is mostly future, but works if it includes historical 'yhat' as well.
+        last_historical_value = df_forecast['yhat'].iloc[max(0, len(df_forecast) - periods - 1)]
+
+    # Calculate the average forecast for the future days
+    avg_forecast_future = future_forecast['yhat'].mean()
+
+    # Calculate the change from the last historical value to the end of the forecast period
+    final_forecast_value = future_forecast['yhat'].iloc[-1]
+    change = final_forecast_value - last_historical_value
+    
+    # Trend Analysis
+    if change > 0:
+        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan menunjukkan **tren meningkat** dalam {periods} hari ke depan, dengan estimasi kenaikan sekitar **Rp {change:,.0f}** dari periode terakhir yang tercatat.")
+    elif change < 0:
+        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan menunjukkan **tren menurun** dalam {periods} hari ke depan, dengan estimasi penurunan sekitar **Rp {abs(change):,.0f}** dari periode terakhir yang tercatat.")
+    else:
+        insights.append(f"{data_type.capitalize()} Anda diperkirakan akan **cenderung stabil** dalam {periods} hari ke depan.")
+
+    # Volatility/Uncertainty Analysis
+    # The range of uncertainty (yhat_upper - yhat_lower)
+    avg_uncertainty_range = (future_forecast['yhat_upper'] - future_forecast['yhat_lower']).mean()
+    if avg_forecast_future != 0: # Avoid division by zero
+        if avg_uncertainty_range < abs(avg_forecast_future) * 0.1: # Example threshold: less than 10% of average forecast
+            insights.append(f"Model menunjukkan **tingkat kepercayaan yang tinggi** terhadap prediksi ini, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari.")
+        elif avg_uncertainty_range < abs(avg_forecast_future) * 0.3: # Example threshold: less than 30%
+            insights.append(f"Prediksi memiliki **tingkat kepercayaan moderat**, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari. Fluktuasi kecil mungkin terjadi.")
+        else:
+            insights.append(f"Ada **ketidakpastian yang cukup tinggi** dalam prediksi ini, dengan rata-rata rentang ketidakpastian sekitar **Rp {avg_uncertainty_range:,.0f}** per hari. Ini bisa disebabkan oleh data historis yang bervariasi. Pertimbangkan untuk menambahkan lebih banyak data atau memeriksa anomali.")
+    else:
+        insights.append(f"Tidak dapat menganalisis volatilitas karena {data_type} rata-rata yang diperkirakan adalah nol.")
+
+    # Seasonal Analysis (simple check for daily/weekly patterns if present)
+    max_forecast_future = future_forecast['yhat'].max()
+    min_forecast_future = future_forecast['yhat'].min()
+    
+    if avg_forecast_future != 0 and (max_forecast_future - min_forecast_future) > (abs(avg_forecast_future) * 0.2): # If fluctuation is more than 20% of avg
+        insights.append(f"Terdapat indikasi **pola musiman** dalam {data_type}, dengan fluktuasi antara **Rp {min_forecast_future:,.0f}** dan **Rp {max_forecast_future:,.0f}** dalam {periods} hari ke depan. Perhatikan hari-hari atau periode tertentu yang mungkin memiliki {data_type} lebih tinggi atau lebih rendah.")
+    else:
+        insights.append(f"Pola musiman yang signifikan tidak terlalu terlihat dalam periode prediksi ini, menunjukkan {data_type} yang cenderung lebih konsisten dari hari ke hari.")
+
+    return insights
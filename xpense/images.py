@@ -0,0 +1,57 @@
+import io
+import os
+
+# Every uploaded image is decoded, rotated upright, downsized and re-encoded
+# before it reaches the blob store. Re-encoding drops EXIF (GPS, camera data)
+# because the metadata is never copied to the new file. Pillow is imported
+# on first use so it stays off the login path.
+MAX_UPLOAD_BYTES = int(os.environ.get("XPENSE_MAX_UPLOAD_MB", "10")) * 1024 * 1024
+MAX_PIXELS = 50_000_000  # refuse decompression bombs before decoding
+MAX_DIMENSION = int(os.environ.get("XPENSE_IMAGE_MAX_DIMENSION", "1600"))
+THUMBNAIL_DIMENSION = 400  # shown at 200 px; 2x for high-density screens
+FORMAT = "WEBP"
+MIME_TYPE = "image/webp"
+QUALITY = 80
+THUMBNAIL_QUALITY = 70
+
+
+class InvalidImageError(Exception):
+    pass
+
+
+def _open(data):
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidImageError(f"Ukuran gambar maksimal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise InvalidImageError("Resolusi gambar terlalu besar.")
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise InvalidImageError("File bukan gambar yang valid.")
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    return image
+
+
+def _encode(image, max_dimension, quality):
+    from PIL import Image
+
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, FORMAT, quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def ingest(data):
+    # Returns (image, thumbnail) as re-encoded bytes; raises InvalidImageError.
+    image = _open(data)
+    return _encode(image, MAX_DIMENSION, QUALITY), _encode(image, THUMBNAIL_DIMENSION, THUMBNAIL_QUALITY)
+
+
+def make_thumbnail(data):
+    return _encode(_open(data), THUMBNAIL_DIMENSION, THUMBNAIL_QUALITY)
@@ -0,0 +1,236 @@
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from xpense import writer
+from xpense.ledger import KATEGORI
+from xpense.settings import get_settings
+
+CHUNK_ROWS = 10_000
+REQUIRED = ["tanggal", "jenis", "kategori", "jumlah"]
+MAX_ERRORS = 1000  # stop collecting messages past this; the count stays exact
+# How long one import waits for a writer command; generous because a large
+# file in the all-or-nothing mode is a single command.
+IMPORT_TIMEOUT = float(os.environ.get("XPENSE_IMPORT_TIMEOUT", "600"))
+
+_INSERT = """
+    INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Spreadsheets rarely match the form's capitalisation, so jenis and kategori
+# are matched case-insensitively and stored in their canonical spelling.
+_JENIS = {jenis.lower(): jenis for jenis in KATEGORI}
+_KATEGORI = {
+    f"{jenis}|{kategori.lower()}": kategori
+    for jenis, kategori_list in KATEGORI.items()
+    for kategori in kategori_list
+}
+
+# Text amounts: an optional "Rp", digits grouped by "." or "," (the form
+# strips both), and at most two decimals after the other separator. Anything
+# else, a minus sign included, is an invalid jumlah rather than a guess.
+_JUMLAH = re.compile(r"""
+    \A(?:rp\.?\s*)?
+    (?:(?P<titik>\d{1,3}(?:\.\d{3})+)(?:,(?P<titik_sen>\d{1,2}))?    # 1.500.000,50
+      |(?P<koma>\d{1,3}(?:,\d{3})+)(?:\.(?P<koma_sen>\d{1,2}))?     # 1,500,000.50
+      |(?P<polos>\d+)(?:[.,](?P<polos_sen>\d{1,2}))?)               # 1500000,50
+    \Z
+""", re.IGNORECASE | re.VERBOSE)
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+class ImportInterrupted(Exception):
+    # A skip_invalid import failed after some chunks had been committed.
+    def __init__(self, imported, error):
+        super().__init__(f"{imported} baris sudah tersimpan sebelum impor terhenti: {error!r}")
+        self.imported = imported
+        self.error = error
+
+
+def _normalize_header(columns):
+    header = [str(c).strip().lower() if c is not None else "" for c in columns]
+    missing = [c for c in REQUIRED if c not in header]
+    if missing:
+        raise ImportFormatError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}.")
+    return header
+
+
+def _csv_chunks(file, chunk_rows):
+    # Spreadsheets saved with an Indonesian locale separate fields with ";".
+    # Sniff it from the header so the fast C parser can be used.
+    header = file.readline()
+    file.seek(0)
+    sep = ";" if header.count(b";") > header.count(b",") else ","
+    # Everything is read as text; jumlah and tanggal are parsed per chunk so a
+    # column's type cannot flip halfway through the file.
+    reader = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                         sep=sep, encoding="utf-8-sig", skip_blank_lines=False)
+    for chunk in reader:
+        chunk.columns = _normalize_header(chunk.columns)
+        yield chunk
+
+
+def _xlsx_chunks(file, chunk_rows):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("Impor Excel membutuhkan paket openpyxl.")
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _normalize_header(next(rows, ()))
+        batch = []
+        for row in rows:
+            if not any(v not in (None, "") for v in row):
+                batch.append((None,) * len(header))  # keep row numbers aligned
+            else:
+                batch.append(row[:len(header)])
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_chunks(file, filename, chunk_rows=CHUNK_ROWS):
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return _csv_chunks(file, chunk_rows)
+    if name.endswith((".xlsx", ".xlsm")):
+        return _xlsx_chunks(file, chunk_rows)
+    raise ImportFormatError("Format file harus CSV atau XLSX.")
+
+
+def _parse_tanggal(values):
+    # ISO dates first (and Excel date cells); anything left is read day-first,
+    # the way Indonesian spreadsheets write 31/01/2025.
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    rest = parsed.isna() & ~_empty(values)
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest].astype(str).str.strip(), errors="coerce",
+                                      dayfirst=True, format="mixed")
+    return parsed
+
+
+def _parse_jumlah(values):
+    # Text follows _JUMLAH: "Rp 1.500.000" and "1,500,000" are both 1500000.
+    # Numeric Excel cells are taken as they are. Rounded to whole rupiah;
+    # NaN marks an invalid amount.
+    is_text = values.map(lambda v: isinstance(v, str))
+    jumlah = pd.to_numeric(values.where(~is_text), errors="coerce")
+    if is_text.any():
+        parts = values[is_text].str.strip().str.extract(_JUMLAH).astype("string")
+        whole = parts["titik"].str.replace(".", "").fillna(parts["koma"].str.replace(",", "")).fillna(parts["polos"])
+        sen = parts["titik_sen"].fillna(parts["koma_sen"]).fillna(parts["polos_sen"]).fillna("0")
+        jumlah[is_text] = pd.to_numeric(whole + "." + sen, errors="coerce").astype(float)
+    return jumlah.round()
+
+
+def _empty(values):
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+
+def validate_chunk(chunk, emergency_rate):
+    """Returns (rows, errors): insert-ready tuples without username, and
+    (index, message) pairs for the rows that were rejected."""
+    n = len(chunk)
+    if "keterangan" not in chunk:
+        chunk["keterangan"] = ""
+    text = {c: chunk[c].fillna("").astype(str).str.strip() for c in ("jenis", "kategori", "keterangan")}
+
+    tanggal = _parse_tanggal(chunk["tanggal"])
+    jumlah = _parse_jumlah(chunk["jumlah"])
+    jenis = text["jenis"].str.lower().map(_JENIS)
+    kategori = (jenis.fillna("") + "|" + text["kategori"].str.lower()).map(_KATEGORI)
+
+    # Fully empty lines (trailing rows in spreadsheets) are skipped silently.
+    blank = _empty(chunk["tanggal"]) & _empty(chunk["jumlah"]) & (text["jenis"] == "") & (text["kategori"] == "")
+    checks = [
+        (tanggal.isna(), "Tanggal tidak valid"),
+        (jenis.isna(), "Jenis harus Pendapatan atau Pengeluaran"),
+        (jenis.notna() & kategori.isna(), "Kategori tidak sesuai dengan jenis"),
+        (jumlah.isna(), "Jumlah tidak valid"),
+        (jumlah.notna() & (jumlah <= 0), "Jumlah harus lebih dari 0"),
+    ]
+    messages = {}
+    for mask, message in checks:
+        for i in np.flatnonzero(mask.to_numpy() & ~blank.to_numpy()):
+            messages.setdefault(int(i), []).append(message)
+    errors = [(i, "; ".join(messages[i])) for i in sorted(messages)]
+
+    valid = np.ones(n, dtype=bool)
+    valid[list(messages)] = False
+    valid &= ~blank.to_numpy()
+    jumlah_int = jumlah[valid].round().astype("int64")
+    pendapatan = (jenis[valid] == "Pendapatan").to_numpy()
+    # Same rule as the form: floor of jumlah * rate / 100, incomes only.
+    dana_darurat = np.where(pendapatan, jumlah_int.to_numpy() * emergency_rate // 100, 0)
+    rows = list(zip(
+        tanggal[valid].dt.strftime("%Y-%m-%d"),
+        kategori[valid],
+        jenis[valid],
+        jumlah_int.tolist(),
+        dana_darurat.tolist(),
+        text["keterangan"][valid],
+    ))
+    return rows, errors
+
+
+def _insert(username, rows):
+    # Writer command for rows from validate_chunk
+    return lambda conn: conn.executemany(_INSERT, [(username, *r) for r in rows])
+
+
+def import_transactions(username, file, filename, skip_invalid=False, chunk_rows=CHUNK_ROWS):
+    """Streams a CSV/XLSX file into laporan_keuangan through the writer.
+
+    Returns (imported, error_count, errors): error_count is the number of
+    rejected rows, errors lists up to MAX_ERRORS (baris, pesan) pairs with
+    baris counted like a spreadsheet (the header is row 1).
+
+    Unless skip_invalid is set the import is all-or-nothing: the file is
+    validated first and then inserted as one writer command, so any invalid
+    row rejects the whole file. With skip_invalid every chunk is its own
+    writer command, so other users' saves are not held up behind a large
+    file, but the import is not atomic: if it fails partway, the chunks
+    committed so far stay and ImportInterrupted reports how many rows that
+    was. A TimeoutError means the writer did not answer within
+    IMPORT_TIMEOUT; the rows are still queued and may land later."""
+    imported = 0
+    error_count = 0
+    errors = []
+    offset = 2
+    pending = []
+    settings = get_settings(username)
+    emergency_rate = settings[0] if settings and settings[0] is not None else 0
+    try:
+        for chunk in read_chunks(file, filename, chunk_rows):
+            rows, chunk_errors = validate_chunk(chunk.reset_index(drop=True), emergency_rate)
+            error_count += len(chunk_errors)
+            errors.extend((offset + i, message) for i, message in chunk_errors[:MAX_ERRORS - len(errors)])
+            offset += len(chunk)
+            if skip_invalid:
+                writer.execute(_insert(username, rows), timeout=IMPORT_TIMEOUT)
+                imported += len(rows)
+            elif not error_count:
+                pending.extend(rows)
+            # else keep validating so every error is reported
+    except Exception as e:
+        if imported:
+            raise ImportInterrupted(imported, e) from e
+        raise
+    if not skip_invalid and not error_count and pending:
+        writer.execute(_insert(username, pending), timeout=IMPORT_TIMEOUT)
+        imported = len(pending)
+    return imported, error_count, errors
@@ -0,0 +1,72 @@
+from xpense import anomaly, writer
+from xpense.blobs import put_blob, release_blob
+from xpense.db import get_connection
+from xpense.images import ingest
+from xpense.settings import invalidate
+
+JENIS = ["Pendapatan", "Pengeluaran"]
+KATEGORI = {
+    "Pendapatan": ["Keuntungan"],
+    "Pengeluaran": ["Listrik", "Gaji", "PDAM", "Bahan Baku", "Sewa Tempat", "Lain-lain"],
+}
+
+
+def data_version(username):
+    with get_connection() as conn:
+        row = conn.execute("SELECT data_version FROM users WHERE username = ?", (username,)).fetchone()
+    return row[0] if row else 0
+
+
+def add_transaction(username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_img=None):
+    # Images are validated and re-encoded before the write is queued;
+    # images.InvalidImageError reaches the caller. Returns (id, anomaly), where
+    # anomaly is (z, usual mean) when jumlah is unusual for the kategori.
+    image = ingest(bukti_img) if bukti_img else None
+
+    def write(conn):
+        # Judged against the history before this row, in the same transaction
+        unusual = anomaly.check(conn, username, kategori, jumlah)
+        bukti_ref = put_blob(conn, *image) if image else None
+        cursor = conn.execute("""
+            INSERT INTO laporan_keuangan (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_ref)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (username, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_ref))
+        return cursor.lastrowid, unusual
+
+    return writer.execute(write)
+
+
+def update_transaction(username, tx_id, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan):
+    def write(conn):
+        conn.execute("""
+            UPDATE laporan_keuangan
+            SET tanggal = ?, kategori = ?, jenis = ?, jumlah = ?, dana_darurat = ?, keterangan = ?
+            WHERE id = ? AND username = ?
+        """, (tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, tx_id, username))
+
+    writer.execute(write)
+
+
+def delete_transaction(username, tx_id):
+    def write(conn):
+        row = conn.execute("SELECT bukti_ref FROM laporan_keuangan WHERE id = ? AND username = ?", (tx_id, username)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM laporan_keuangan WHERE id = ? AND username = ?", (tx_id, username))
+        release_blob(conn, row[0])
+
+    writer.execute(write)
+
+
+def set_profile_pic(username, data):
+    image, thumb = ingest(data)
+
+    def write(conn):
+        row = conn.execute("SELECT profile_ref FROM users WHERE username = ?", (username,)).fetchone()
+        new_ref = put_blob(conn, image, thumb)
+        conn.execute("UPDATE users SET profile_ref = ? WHERE username = ?", (new_ref, username))
+        if row and row[0] != new_ref:
+            release_blob(conn, row[0])
+
+    writer.execute(write)
+    invalidate(username)
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process timings for page renders, SQL statements and forecast fits.
+# Every observation lands in a (metric, labels) series holding count, sum and
+# max; nothing is kept per event, so the overhead is a dict update under a
+# lock. flush() writes the series to XPENSE_METRICS_FILE for a local scraper:
+# Prometheus text format for *.prom, one JSON object per series for *.jsonl.
+ENABLED = os.environ.get("XPENSE_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("XPENSE_METRICS_FILE", os.path.join(".cache", "metrics.prom"))
+FLUSH_INTERVAL = float(os.environ.get("XPENSE_METRICS_FLUSH_SECONDS", "10"))
+PREFIX = "xpense_"
+
+HELP = {
+    "page_render_seconds": "Time to run a page function, per rerun.",
+    "sql_statement_seconds": "Time spent in execute() per SQL statement.",
+    "forecast_fit_seconds": "Time to fit a forecasting model.",
+    "forecast_predict_seconds": "Time to predict from a fitted model.",
+    "forecast_series_points": "Length of the series passed to fit().",
+    "writer_batch_size": "Write commands committed together by the writer thread.",
+    "writer_commit_seconds": "Time from BEGIN to COMMIT of one writer batch.",
+}
+
+_lock = threading.Lock()
+_series = {}
+_started = time.time()
+_last_flush = 0.0
+
+
+def observe(metric, value, **labels):
+    if not ENABLED:
+        return
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        stats = _series.get(key)
+        if stats is None:
+            _series[key] = [1, value, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+            if value > stats[2]:
+                stats[2] = value
+
+
+@contextmanager
+def timer(metric, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - started, **labels)
+
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def statement_label(sql):
+    # One series per statement shape: whitespace collapsed and "IN (?, ?, ?)"
+    # lists folded so their length doesn't create new series.
+    sql = _PLACEHOLDER_LIST.sub("(?, ...)", _WHITESPACE.sub(" ", sql).strip())
+    return sql if len(sql) <= 160 else sql[:157] + "..."
+
+
+def snapshot():
+    with _lock:
+        items = [(metric, labels, list(stats)) for (metric, labels), stats in _series.items()]
+    return [
+        {"metric": metric, "labels": dict(labels), "count": count, "sum": total, "max": peak}
+        for metric, labels, (count, total, peak) in sorted(items)
+    ]
+
+
+def drain():
+    # Snapshot and reset; worker processes hand their series to the parent.
+    with _lock:
+        items = [(metric, labels, stats) for (metric, labels), stats in _series.items()]
+        _series.clear()
+    return items
+
+
+def merge(items):
+    with _lock:
+        for metric, labels, (count, total, peak) in items:
+            key = (metric, tuple(labels))
+            stats = _series.get(key)
+            if stats is None:
+                _series[key] = [count, total, peak]
+            else:
+                stats[0] += count
+                stats[1] += total
+                stats[2] = max(stats[2], peak)
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(series=None):
+    series = snapshot() if series is None else series
+    lines = []
+    by_metric = {}
+    for item in series:
+        by_metric.setdefault(item["metric"], []).append(item)
+    for metric, items in by_metric.items():
+        name = PREFIX + metric
+        if metric in HELP:
+            lines.append(f"# HELP {name} {HELP[metric]}")
+        lines.append(f"# TYPE {name} summary")
+        for item in items:
+            lines.append(f"{name}_count{_labels(item['labels'])} {item['count']}")
+            lines.append(f"{name}_sum{_labels(item['labels'])} {item['sum']:.6f}")
+        lines.append(f"# TYPE {name}_max gauge")
+        for item in items:
+            lines.append(f"{name}_max{_labels(item['labels'])} {item['max']:.6f}")
+    lines.append(f"# TYPE {PREFIX}process_start_time_seconds gauge")
+    lines.append(f"{PREFIX}process_start_time_seconds {_started:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def render_jsonl(series=None):
+    series = snapshot() if series is None else series
+    now = round(time.time(), 3)
+    return "".join(json.dumps({"ts": now, "pid": os.getpid(), **item}) + "\n" for item in series)
+
+
+def flush(path=None, force=False):
+    # Rewrites the whole file (atomically) at most every FLUSH_INTERVAL seconds.
+    global _last_flush
+    path = path or METRICS_FILE
+    if not ENABLED or not path:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    text = render_jsonl() if path.endswith(".jsonl") else render_prometheus()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,361 @@
+import sqlite3
+import threading
+
+from xpense import db
+from xpense.blobs import blob_ref
+from xpense.db import get_connection
+
+
+def _create_base_tables(conn):
+    # Same layout the app has always created, so existing databases
+    # (user_version 0 with tables already present) pass through unchanged.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password_hash TEXT NOT NULL,
+        role TEXT DEFAULT 'user',
+        profile_pic BLOB,
+        emergency_rate INTEGER DEFAULT 10
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS laporan_keuangan (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        tanggal TEXT,
+        kategori TEXT,
+        jenis TEXT,
+        jumlah INTEGER,
+        dana_darurat INTEGER,
+        keterangan TEXT,
+        bukti_img BLOB
+    )
+    """)
+
+
+def _add_ledger_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_laporan_username_tanggal ON laporan_keuangan (username, tanggal)")
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_laporan_username_jenis_kategori_tanggal
+    ON laporan_keuangan (username, jenis, kategori, tanggal)
+    """)
+
+
+def _move_images_to_blob_store(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL
+    )
+    """)
+    conn.execute("ALTER TABLE laporan_keuangan ADD COLUMN bukti_ref TEXT")
+    conn.execute("ALTER TABLE users ADD COLUMN profile_ref TEXT")
+    conn.execute("CREATE INDEX idx_laporan_bukti_ref ON laporan_keuangan (bukti_ref) WHERE bukti_ref IS NOT NULL")
+    conn.execute("CREATE INDEX idx_users_profile_ref ON users (profile_ref) WHERE profile_ref IS NOT NULL")
+
+    conn.create_function("blob_ref", 1, blob_ref, deterministic=True)
+    for table, column, ref_column in (("laporan_keuangan", "bukti_img", "bukti_ref"), ("users", "profile_pic", "profile_ref")):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO blobs (hash, data, size)
+            SELECT blob_ref({column}), {column}, length({column}) FROM {table}
+            WHERE {column} IS NOT NULL AND length({column}) > 0
+        """)
+        conn.execute(f"""
+            UPDATE {table} SET {ref_column} = blob_ref({column}), {column} = NULL
+            WHERE {column} IS NOT NULL AND length({column}) > 0
+        """)
+        # DROP COLUMN needs SQLite 3.35; older libraries keep the emptied column.
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+
+# Shared by migration 4 (initial backfill) and xpense.rollup (repair).
+DAILY_SUMMARY_BACKFILL = """
+    INSERT INTO daily_summary (username, tanggal, jenis, kategori, jumlah, transaksi)
+    SELECT username, tanggal, jenis, kategori, SUM(jumlah), COUNT(*)
+    FROM laporan_keuangan
+    {where}
+    GROUP BY username, tanggal, jenis, kategori
+"""
+
+
+def _add_daily_summary(conn):
+    # Rollup kept in step with laporan_keuangan by triggers, so dashboard reads
+    # scale with the number of days rather than the number of transactions.
+    conn.execute("""
+    CREATE TABLE daily_summary (
+        username TEXT NOT NULL,
+        tanggal TEXT NOT NULL,
+        jenis TEXT NOT NULL,
+        kategori TEXT NOT NULL,
+        jumlah INTEGER NOT NULL DEFAULT 0,
+        transaksi INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, tanggal, jenis, kategori)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_daily_summary_insert AFTER INSERT ON laporan_keuangan
+    BEGIN
+        INSERT INTO daily_summary (username, tanggal, jenis, kategori, jumlah, transaksi)
+        VALUES (NEW.username, NEW.tanggal, NEW.jenis, NEW.kategori, NEW.jumlah, 1)
+        ON CONFLICT (username, tanggal, jenis, kategori)
+        DO UPDATE SET jumlah = jumlah + excluded.jumlah, transaksi = transaksi + 1;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_daily_summary_delete AFTER DELETE ON laporan_keuangan
+    BEGIN
+        UPDATE daily_summary SET jumlah = jumlah - OLD.jumlah, transaksi = transaksi - 1
+        WHERE username = OLD.username AND tanggal = OLD.tanggal AND jenis = OLD.jenis AND kategori = OLD.kategori;
+        DELETE FROM daily_summary
+        WHERE username = OLD.username AND tanggal = OLD.tanggal AND jenis = OLD.jenis AND kategori = OLD.kategori
+          AND transaksi <= 0;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_daily_summary_update
+    AFTER UPDATE OF username, tanggal, jenis, kategori, jumlah ON laporan_keuangan
+    BEGIN
+        UPDATE daily_summary SET jumlah = jumlah - OLD.jumlah, transaksi = transaksi - 1
+        WHERE username = OLD.username AND tanggal = OLD.tanggal AND jenis = OLD.jenis AND kategori = OLD.kategori;
+        DELETE FROM daily_summary
+        WHERE username = OLD.username AND tanggal = OLD.tanggal AND jenis = OLD.jenis AND kategori = OLD.kategori
+          AND transaksi <= 0;
+        INSERT INTO daily_summary (username, tanggal, jenis, kategori, jumlah, transaksi)
+        VALUES (NEW.username, NEW.tanggal, NEW.jenis, NEW.kategori, NEW.jumlah, 1)
+        ON CONFLICT (username, tanggal, jenis, kategori)
+        DO UPDATE SET jumlah = jumlah + excluded.jumlah, transaksi = transaksi + 1;
+    END
+    """)
+    conn.execute(DAILY_SUMMARY_BACKFILL.format(where=""))
+
+
+def _add_data_version(conn):
+    # Bumped on every ledger change so caches can tell when a user's data moved.
+    conn.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+    CREATE TRIGGER trg_data_version_insert AFTER INSERT ON laporan_keuangan
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE username = NEW.username;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_data_version_delete AFTER DELETE ON laporan_keuangan
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE username = OLD.username;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_data_version_update AFTER UPDATE ON laporan_keuangan
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE username IN (OLD.username, NEW.username);
+    END
+    """)
+
+
+def _add_forecast_results(conn):
+    # Written by python -m xpense.batch_forecast, read by the dashboard.
+    conn.execute("""
+    CREATE TABLE forecast_results (
+        username TEXT NOT NULL,
+        forecast_type TEXT NOT NULL,
+        periods INTEGER NOT NULL,
+        data_version INTEGER NOT NULL,
+        model_json TEXT NOT NULL,
+        forecast_json TEXT NOT NULL,
+        insights_json TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (username, forecast_type)
+    )
+    """)
+
+
+def _add_blob_thumbnails(conn):
+    # Filled at upload time; older blobs get theirs lazily (blobs.get_thumbnail).
+    conn.execute("ALTER TABLE blobs ADD COLUMN thumb BLOB")
+
+
+def _add_daily_summary_date_index(conn):
+    # Cross-user date ranges for xpense.admin. The table is WITHOUT ROWID, so
+    # the index also carries the primary key columns and covers those queries.
+    conn.execute("CREATE INDEX idx_daily_summary_tanggal ON daily_summary (tanggal, jumlah, transaksi)")
+
+
+def _add_balance_snapshots(conn):
+    # Month-end running balance per user, built lazily by xpense.balance. A
+    # ledger change drops the snapshots from its month onwards; earlier ones
+    # stay valid.
+    conn.execute("""
+    CREATE TABLE balance_snapshots (
+        username TEXT NOT NULL,
+        bulan TEXT NOT NULL,
+        saldo INTEGER NOT NULL,
+        dana_darurat INTEGER NOT NULL,
+        PRIMARY KEY (username, bulan)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_balance_snapshots_insert AFTER INSERT ON laporan_keuangan
+    BEGIN
+        DELETE FROM balance_snapshots WHERE username = NEW.username AND bulan >= substr(NEW.tanggal, 1, 7);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_balance_snapshots_delete AFTER DELETE ON laporan_keuangan
+    BEGIN
+        DELETE FROM balance_snapshots WHERE username = OLD.username AND bulan >= substr(OLD.tanggal, 1, 7);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_balance_snapshots_update
+    AFTER UPDATE OF username, tanggal, jenis, jumlah, dana_darurat ON laporan_keuangan
+    BEGIN
+        DELETE FROM balance_snapshots WHERE username = OLD.username AND bulan >= substr(OLD.tanggal, 1, 7);
+        DELETE FROM balance_snapshots WHERE username = NEW.username AND bulan >= substr(NEW.tanggal, 1, 7);
+    END
+    """)
+
+
+
+def _add_search_index(conn):
+    # External-content FTS5 index over laporan_keuangan for the Riwayat search
+    # box; the rows themselves are not copied. username is indexed so a MATCH
+    # can be narrowed to one user's documents before ranking.
+    conn.execute("""
+    CREATE VIRTUAL TABLE laporan_fts USING fts5(
+        username, keterangan, kategori,
+        content = 'laporan_keuangan', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_laporan_fts_insert AFTER INSERT ON laporan_keuangan
+    BEGIN
+        INSERT INTO laporan_fts (rowid, username, keterangan, kategori)
+        VALUES (NEW.id, NEW.username, NEW.keterangan, NEW.kategori);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_laporan_fts_delete AFTER DELETE ON laporan_keuangan
+    BEGIN
+        INSERT INTO laporan_fts (laporan_fts, rowid, username, keterangan, kategori)
+        VALUES ('delete', OLD.id, OLD.username, OLD.keterangan, OLD.kategori);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_laporan_fts_update AFTER UPDATE OF username, keterangan, kategori ON laporan_keuangan
+    BEGIN
+        INSERT INTO laporan_fts (laporan_fts, rowid, username, keterangan, kategori)
+        VALUES ('delete', OLD.id, OLD.username, OLD.keterangan, OLD.kategori);
+        INSERT INTO laporan_fts (rowid, username, keterangan, kategori)
+        VALUES (NEW.id, NEW.username, NEW.keterangan, NEW.kategori);
+    END
+    """)
+    conn.execute("INSERT INTO laporan_fts (laporan_fts) VALUES ('rebuild')")
+
+
+
+# Welford's update for adding / removing one amount x to a (n, mean, m2)
+# row. In an UPDATE every right-hand side sees the old values, so the new
+# mean is spelled out where m2 needs it.
+_STATS_ADD = """
+    INSERT INTO kategori_stats (username, kategori, n, mean, m2)
+    VALUES ({row}.username, {row}.kategori, 1, {row}.jumlah, 0)
+    ON CONFLICT (username, kategori) DO UPDATE SET
+        n = n + 1,
+        mean = mean + (excluded.mean - mean) / (n + 1),
+        m2 = m2 + (excluded.mean - mean) * (excluded.mean - (mean + (excluded.mean - mean) / (n + 1)));
+"""
+_STATS_REMOVE = """
+    UPDATE kategori_stats SET
+        n = n - 1,
+        mean = CASE WHEN n > 1 THEN (n * mean - {row}.jumlah) / (n - 1) ELSE 0 END,
+        m2 = CASE WHEN n > 1
+                  THEN max(0, m2 - ({row}.jumlah - mean) * ({row}.jumlah - (n * mean - {row}.jumlah) / (n - 1)))
+                  ELSE 0 END
+    WHERE username = {row}.username AND kategori = {row}.kategori;
+    DELETE FROM kategori_stats WHERE username = {row}.username AND kategori = {row}.kategori AND n <= 0;
+"""
+
+
+def _add_kategori_stats(conn):
+    # Running count / mean / M2 of jumlah per user and kategori, kept in O(1)
+    # per change by triggers, for xpense.anomaly. The index serves its
+    # "amounts above the threshold" lookups.
+    conn.execute("""
+    CREATE TABLE kategori_stats (
+        username TEXT NOT NULL,
+        kategori TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        m2 REAL NOT NULL,
+        PRIMARY KEY (username, kategori)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_laporan_username_kategori_jumlah ON laporan_keuangan (username, kategori, jumlah)")
+    conn.execute(f"""
+    CREATE TRIGGER trg_kategori_stats_insert AFTER INSERT ON laporan_keuangan
+    BEGIN {_STATS_ADD.format(row="NEW")} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER trg_kategori_stats_delete AFTER DELETE ON laporan_keuangan
+    BEGIN {_STATS_REMOVE.format(row="OLD")} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER trg_kategori_stats_update AFTER UPDATE OF username, kategori, jumlah ON laporan_keuangan
+    BEGIN {_STATS_REMOVE.format(row="OLD")} {_STATS_ADD.format(row="NEW")} END
+    """)
+    # A new database has no ledger yet; skip pandas on that path entirely.
+    if conn.execute("SELECT 1 FROM laporan_keuangan LIMIT 1").fetchone() is None:
+        return
+    from xpense.anomaly import rebuild_stats
+
+    rebuild_stats(conn)
+
+
+# Append only: position N-1 upgrades a database from user_version N-1 to N.
+MIGRATIONS = [
+    _create_base_tables,
+    _add_ledger_indexes,
+    _move_images_to_blob_store,
+    _add_daily_summary,
+    _add_data_version,
+    _add_forecast_results,
+    _add_blob_thumbnails,
+    _add_daily_summary_date_index,
+    _add_balance_snapshots,
+    _add_search_index,
+    _add_kategori_stats,
+]
+
+_applied = {}
+_lock = threading.Lock()
+
+
+def schema_version(path=None):
+    with get_connection(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path=None, target=None):
+    path = path or db.DB_NAME
+    target = len(MIGRATIONS) if target is None else target
+    with _lock:
+        if _applied.get(path, -1) >= target:
+            return _applied[path]
+        with get_connection(path) as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            while version < target:
+                # Re-read inside the write lock so concurrent processes
+                # never apply the same step twice.
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < target:
+                    MIGRATIONS[version](conn)
+                    version += 1
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            conn.execute("PRAGMA optimize")
+        _applied[path] = version
+        return version
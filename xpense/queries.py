@@ -0,0 +1,216 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.ledger import JENIS, data_version
+
+# Dashboard reads go to the daily_summary rollup (one row per user, day, jenis
+# and kategori); only the Riwayat pages read laporan_keuangan itself.
+
+RIWAYAT_PAGE_SIZE = 20
+# Typed rollup frames kept in memory, least recently used dropped first
+FRAME_CACHE_ENTRIES = int(os.environ.get("XPENSE_FRAME_CACHE_ENTRIES", "64"))
+JENIS_DTYPE = pd.CategoricalDtype(JENIS)
+
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def where_clause(username, jenis=None, kategori=None, hari=None, bulan=None, tahun=None, rentang=None):
+    # Turns the dashboard filter widgets into a parameterized WHERE clause.
+    # tanggal is stored as ISO text (YYYY-MM-DD), so date filters compare strings.
+    clauses = ["username = ?"]
+    params = [username]
+    if jenis:
+        clauses.append("jenis = ?")
+        params.append(jenis)
+    if kategori:
+        clauses.append("kategori = ?")
+        params.append(kategori)
+    if hari:
+        clauses.append("tanggal = ?")
+        params.append(hari.isoformat())
+    if bulan:
+        clauses.append("substr(tanggal, 6, 2) = ?")
+        params.append(f"{bulan:02d}")
+    if tahun:
+        clauses.append("tanggal >= ? AND tanggal < ?")
+        params.extend([f"{tahun}-01-01", f"{int(tahun) + 1}-01-01"])
+    if rentang:
+        clauses.append("tanggal BETWEEN ? AND ?")
+        params.extend([rentang[0].isoformat(), rentang[1].isoformat()])
+    return " AND ".join(clauses), params
+
+
+def summary_frame(username):
+    # The user's whole rollup as a compact typed frame: datetime64 tanggal,
+    # categorical jenis/kategori, int64 jumlah, int32 transaksi. It is cached
+    # per user and reused until data_version moves (every insert, edit and
+    # delete bumps it), so a rerun that only changes a widget costs one
+    # primary-key lookup. The frame is shared: callers must not modify it.
+    version = data_version(username)
+    key = (db.DB_NAME, username)
+    with _frames_lock:
+        cached = _frames.get(key)
+        if cached is not None and cached[0] == version:
+            _frames.move_to_end(key)
+            return cached[1]
+    with get_connection() as conn:
+        frame = pd.read_sql_query("""
+            SELECT tanggal, jenis, kategori, jumlah, transaksi FROM daily_summary
+            WHERE username = ? ORDER BY tanggal
+        """, conn, params=(username,))
+    frame["tanggal"] = pd.to_datetime(frame["tanggal"], format="%Y-%m-%d")
+    frame["jenis"] = frame["jenis"].astype(JENIS_DTYPE)
+    frame["kategori"] = frame["kategori"].astype("category")
+    frame["jumlah"] = frame["jumlah"].astype("int64")
+    frame["transaksi"] = frame["transaksi"].astype("int32")
+    # version was read first, so the frame is never older than the key it is
+    # stored under; a write in between only causes one extra reload.
+    with _frames_lock:
+        _frames[key] = (version, frame)
+        _frames.move_to_end(key)
+        while len(_frames) > FRAME_CACHE_ENTRIES:
+            _frames.popitem(last=False)
+    return frame
+
+
+def _filter(frame, jenis=None, kategori=None, hari=None, bulan=None, tahun=None, rentang=None):
+    # Same filters as where_clause, applied to a summary_frame
+    mask = pd.Series(True, index=frame.index)
+    if jenis:
+        mask &= frame["jenis"] == jenis
+    if kategori:
+        mask &= frame["kategori"] == kategori
+    if hari:
+        mask &= frame["tanggal"] == pd.Timestamp(hari)
+    if bulan:
+        mask &= frame["tanggal"].dt.month == int(bulan)
+    if tahun:
+        mask &= frame["tanggal"].dt.year == int(tahun)
+    if rentang:
+        mask &= frame["tanggal"].between(pd.Timestamp(rentang[0]), pd.Timestamp(rentang[1]))
+    return frame[mask]
+
+
+def has_transactions(username):
+    return not summary_frame(username).empty
+
+
+def kategori_options(username, jenis=None):
+    frame = _filter(summary_frame(username), jenis=jenis)
+    return sorted(frame["kategori"].unique().tolist())
+
+
+def tahun_options(username, jenis=None, kategori=None):
+    frame = _filter(summary_frame(username), jenis=jenis, kategori=kategori)
+    return sorted(frame["tanggal"].dt.year.unique().tolist())
+
+
+def daily_summary(username, **filters):
+    # One row per day with income/expense sums and the number of rows behind
+    # each sum, so callers can tell "no income that day" from "income of 0".
+    frame = _filter(summary_frame(username), **filters)
+    pendapatan = (frame["jenis"] == "Pendapatan").to_numpy()
+    jumlah = frame["jumlah"].to_numpy()
+    transaksi = frame["transaksi"].to_numpy().astype("int64")
+    df = pd.DataFrame({
+        "tanggal": frame["tanggal"].to_numpy(),
+        "pendapatan": jumlah * pendapatan,
+        "pengeluaran": jumlah * ~pendapatan,
+        "n_pendapatan": transaksi * pendapatan,
+        "n_pengeluaran": transaksi * ~pendapatan,
+    })
+    return df.groupby("tanggal", as_index=False, sort=True).sum()
+
+
+def kategori_daily(username, **filters):
+    # Wide per-day frame, one column of jumlah sums per kategori (NaN on days
+    # without that kategori), built in a single pivot for all of them.
+    frame = _filter(summary_frame(username), **filters)
+    return frame.pivot_table(index="tanggal", columns="kategori", values="jumlah", aggfunc="sum", observed=True)
+
+
+def count_transactions(username, **filters):
+    where, params = where_clause(username, **filters)
+    with get_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM laporan_keuangan WHERE {where}", params).fetchone()[0]
+
+
+def transactions_page(username, after=None, page_size=RIWAYAT_PAGE_SIZE, newest_first=True, **filters):
+    # Keyset pagination on (tanggal, id): `after` is the (tanggal, id) of the
+    # last row of the previous page, so every page is an index range scan no
+    # matter how deep the user pages. Images stay behind bukti_ref.
+    where, params = where_clause(username, **filters)
+    direction, compare = ("DESC", "<") if newest_first else ("ASC", ">")
+    if after is not None:
+        where += f" AND (tanggal, id) {compare} (?, ?)"
+        params.extend(after)
+    with get_connection() as conn:
+        cursor = conn.execute(f"""
+            SELECT id, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_ref
+            FROM laporan_keuangan
+            WHERE {where}
+            ORDER BY tanggal {direction}, id {direction}
+            LIMIT ?
+        """, params + [page_size])
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def search_query(text, username):
+    # Turns the search box into an FTS5 MATCH expression: every word must
+    # start a word in keterangan or kategori ("list" finds "Listrik"). Words
+    # are quoted so FTS syntax typed by the user stays literal. The username
+    # phrase narrows the match to the user's rows before ranking; the join in
+    # search_transactions checks the exact name.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    query = "{keterangan kategori} : (" + " ".join(f'"{word}"*' for word in words) + ")"
+    if re.search(r"\w", username):
+        query += ' AND username : "' + username.replace('"', '""') + '"'
+    return query
+
+
+def count_search(username, text, **filters):
+    match = search_query(text, username)
+    if match is None:
+        return 0
+    where, params = where_clause(username, **filters)
+    with get_connection() as conn:
+        return conn.execute(f"""
+            SELECT COUNT(*)
+            FROM (SELECT rowid AS hit FROM laporan_fts WHERE laporan_fts MATCH ?)
+            CROSS JOIN laporan_keuangan ON id = hit
+            WHERE {where}
+        """, [match] + params).fetchone()[0]
+
+
+def search_transactions(username, text, offset=0, page_size=RIWAYAT_PAGE_SIZE, newest_first=True, **filters):
+    # Best bm25 match first (keterangan weighs more than kategori), then by
+    # date. Ranking needs every match, so pages are plain offsets. CROSS JOIN
+    # keeps the FTS match as the outer loop; the planner may otherwise scan
+    # the user's whole ledger and probe the index per row.
+    match = search_query(text, username)
+    if match is None:
+        return []
+    where, params = where_clause(username, **filters)
+    direction = "DESC" if newest_first else "ASC"
+    with get_connection() as conn:
+        cursor = conn.execute(f"""
+            SELECT id, tanggal, kategori, jenis, jumlah, dana_darurat, keterangan, bukti_ref
+            FROM (SELECT rowid AS hit, bm25(laporan_fts, 0.0, 10.0, 2.0) AS score
+                  FROM laporan_fts WHERE laporan_fts MATCH ?)
+            CROSS JOIN laporan_keuangan ON id = hit
+            WHERE {where}
+            ORDER BY score, tanggal {direction}, id {direction}
+            LIMIT ? OFFSET ?
+        """, [match] + params + [page_size, offset])
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,38 @@
+"""Rebuild the daily_summary rollup from laporan_keuangan.
+
+    python -m xpense.rollup               # every user
+    python -m xpense.rollup --user alice  # one user
+"""
+import argparse
+
+from xpense import db
+from xpense.db import get_connection
+from xpense.migrations import DAILY_SUMMARY_BACKFILL, migrate
+
+
+def rebuild_daily_summary(username=None):
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        where, params = ("", ()) if username is None else ("WHERE username = ?", (username,))
+        conn.execute(f"DELETE FROM daily_summary {where}", params)
+        conn.execute(DAILY_SUMMARY_BACKFILL.format(where=where), params)
+        # Cached frames and forecasts are keyed on data_version; a rebuilt
+        # rollup may differ from what they were computed from.
+        conn.execute(f"UPDATE users SET data_version = data_version + 1 {where}", params)
+        return conn.execute(f"SELECT COUNT(*) FROM daily_summary {where}", params).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", help="hanya bangun ulang ringkasan untuk user ini")
+    parser.add_argument("--db", default=db.DB_NAME)
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    migrate()
+    rows = rebuild_daily_summary(args.user)
+    print(f"daily_summary dibangun ulang: {rows:,} baris.")
+
+
+if __name__ == "__main__":
+    main()
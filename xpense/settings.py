@@ -0,0 +1,52 @@
+import threading
+
+from xpense import writer
+from xpense.db import get_connection
+
+# Per-user settings (emergency_rate, profile_ref) are read on nearly every
+# rerun but change only when the user moves the slider or uploads a profile
+# picture. They are cached for the whole process; every write goes through
+# this module or calls invalidate(), which bumps the user's generation so
+# per-session copies notice without a query.
+
+_lock = threading.Lock()
+_cache = {}
+_generations = {}
+
+
+def _load(username):
+    with get_connection() as conn:
+        return conn.execute("SELECT emergency_rate, profile_ref FROM users WHERE username = ?", (username,)).fetchone()
+
+
+def invalidate(username):
+    with _lock:
+        _cache.pop(username, None)
+        _generations[username] = _generations.get(username, 0) + 1
+
+
+def get_settings(username, session=None):
+    """Returns (emergency_rate, profile_ref), or None for an unknown user.
+
+    `session` is an optional dict-like (st.session_state) that keeps the
+    value for the current session."""
+    generation = _generations.get(username, 0)
+    if session is not None:
+        cached = session.get("user_settings")
+        if cached and cached[0] == username and cached[1] == generation:
+            return cached[2]
+    settings = _cache.get(username)
+    if settings is None:
+        settings = _load(username)
+        with _lock:
+            # A write that landed while we were reading makes this row stale.
+            if settings is not None and _generations.get(username, 0) == generation:
+                _cache[username] = settings
+    if session is not None and settings is not None:
+        session["user_settings"] = (username, generation, settings)
+    return settings
+
+
+def set_emergency_rate(username, rate):
+    writer.execute(lambda conn: conn.execute("UPDATE users SET emergency_rate = ? WHERE username = ?", (rate, username)))
+    invalidate(username)
@@ -0,0 +1,136 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from xpense import db, metrics
+
+# All writes from the app go through one writer thread per database. It owns
+# the only write connection, takes whatever commands are queued (up to
+# MAX_BATCH) and runs them in a single BEGIN IMMEDIATE transaction, one
+# savepoint per command, so a failing command only rolls back itself.
+# Callers get their result once the batch has committed. Reads keep using the
+# connection pool; under WAL they never wait for the writer.
+#
+# Bulk imports are writer commands too (xpense.importer). The maintenance
+# CLIs still take their own IMMEDIATE transaction, which can outlast
+# busy_timeout; the writer keeps retrying BEGIN until WRITE_TIMEOUT.
+MAX_BATCH = int(os.environ.get("XPENSE_WRITE_BATCH", "64"))
+WRITE_TIMEOUT = float(os.environ.get("XPENSE_WRITE_TIMEOUT", "30"))
+
+_STOP = object()
+
+
+class Writer:
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="xpense-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, command):
+        # command(conn) runs on the writer thread; it must not commit.
+        future = Future()
+        self._queue.put((command, future))
+        return future
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        # Autocommit mode: the writer issues BEGIN/SAVEPOINT/COMMIT itself.
+        conn = db.connect(self.path, isolation_level=None)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                stop = False
+                while len(batch) < MAX_BATCH:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _begin(self, conn):
+        deadline = time.monotonic() + WRITE_TIMEOUT
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if e.sqlite_errorcode != sqlite3.SQLITE_BUSY or time.monotonic() >= deadline:
+                    raise
+
+    def _commit(self, conn, batch):
+        batch = [(command, future) for command, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            self._begin(conn)
+            for command, _ in batch:
+                conn.execute("SAVEPOINT command")
+                try:
+                    outcomes.append((command(conn), None))
+                    conn.execute("RELEASE command")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO command")
+                    conn.execute("RELEASE command")
+                    outcomes.append((None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        metrics.observe("writer_batch_size", len(batch))
+        metrics.observe("writer_commit_seconds", time.perf_counter() - started)
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path=None):
+    path = path or db.DB_NAME
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = Writer(path)
+        return writer
+
+
+def close_writers():
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
+
+
+def execute(command, path=None, timeout=WRITE_TIMEOUT):
+    # Queues command(conn) and waits until its batch has committed. Errors
+    # raised by the command (e.g. sqlite3.IntegrityError) reach the caller.
+    # A TimeoutError means the writer is stuck; the command stays queued.
+    # Long commands (bulk imports) pass a larger timeout.
+    return get_writer(path).submit(command).result(timeout=timeout)